@@ -0,0 +1,277 @@
+import logging
+import threading
+import time
+from array import array
+from collections import deque
+
+import numpy as np
+from config import Config
+from trades import BUY
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {
+    '5m': 300,
+    '1h': 3600,
+    '6h': 6 * 3600,
+    '24h': 86400,
+}
+
+# Each window is a ring of this many time buckets
+BUCKETS_PER_WINDOW = 60
+
+
+# Rolling sums over one window, kept in a ring of time buckets with running totals:
+# adding a trade and evicting a bucket are both O(1)
+class RollingWindow:
+    FIELDS = ('volume_usd', 'buy_volume_usd', 'sell_volume_usd', 'amount0', 'buys', 'sells')
+
+    def __init__(self, window_seconds, buckets=BUCKETS_PER_WINDOW):
+        self.window = window_seconds
+        self.size = buckets
+        self.bucket_seconds = max(1, window_seconds // buckets)
+        self.starts = array('q', [-1] * buckets)
+        self.sums = {name: array('d', bytes(8 * buckets)) for name in self.FIELDS}
+        # First and last trade price (and time) per bucket, for the window's price change
+        self.open = array('d', bytes(8 * buckets))
+        self.open_ts = array('q', bytes(8 * buckets))
+        self.close = array('d', bytes(8 * buckets))
+        self.close_ts = array('q', bytes(8 * buckets))
+        self.totals = dict.fromkeys(self.FIELDS, 0.0)
+        self.head = None
+
+    def _slot(self, bucket_start):
+        return (bucket_start // self.bucket_seconds) % self.size
+
+    def _clear(self, i):
+        if self.starts[i] == -1:
+            return
+        for name in self.FIELDS:
+            self.totals[name] -= self.sums[name][i]
+            self.sums[name][i] = 0.0
+        self.starts[i] = -1
+
+    # Move the newest bucket forward, clearing the buckets that fall out of the window
+    def advance(self, timestamp):
+        bucket_start = timestamp - timestamp % self.bucket_seconds
+        if self.head is not None and bucket_start <= self.head:
+            return
+        if self.head is None or bucket_start - self.head >= self.window:
+            for i in range(self.size):
+                self.starts[i] = -1
+                for name in self.FIELDS:
+                    self.sums[name][i] = 0.0
+            # Exact zero instead of accumulated float error
+            self.totals = dict.fromkeys(self.FIELDS, 0.0)
+        else:
+            for start in range(self.head + self.bucket_seconds, bucket_start + 1, self.bucket_seconds):
+                self._clear(self._slot(start))
+        self.head = bucket_start
+
+    def add(self, timestamp, price, volume_usd, amount0, is_buy):
+        self.advance(timestamp)
+        bucket_start = timestamp - timestamp % self.bucket_seconds
+        if bucket_start <= self.head - self.size * self.bucket_seconds:
+            return
+        i = self._slot(bucket_start)
+        if self.starts[i] != bucket_start:
+            self._clear(i)
+            self.starts[i] = bucket_start
+            self.open[i], self.open_ts[i] = price, timestamp
+            self.close[i], self.close_ts[i] = price, timestamp
+        else:
+            if timestamp < self.open_ts[i]:
+                self.open[i], self.open_ts[i] = price, timestamp
+            if timestamp >= self.close_ts[i]:
+                self.close[i], self.close_ts[i] = price, timestamp
+        side = 'buy' if is_buy else 'sell'
+        for name, value in (('volume_usd', volume_usd), (f'{side}_volume_usd', volume_usd),
+                            ('amount0', amount0), (f'{side}s', 1.0)):
+            self.sums[name][i] += value
+            self.totals[name] += value
+
+    # Oldest open and newest close among live buckets (at most BUCKETS_PER_WINDOW to scan)
+    def _open_close(self):
+        first = last = None
+        for i in range(self.size):
+            start = self.starts[i]
+            if start == -1 or self.open[i] <= 0:
+                continue
+            if first is None or start < self.starts[first]:
+                first = i
+            if last is None or start > self.starts[last]:
+                last = i
+        if first is None:
+            return 0.0, 0.0
+        return self.open[first], self.close[last]
+
+    def stats(self, now=None):
+        self.advance(int(now or time.time()))
+        totals = self.totals
+        open_price, close_price = self._open_close()
+        return {
+            'volume_usd': max(0.0, totals['volume_usd']),
+            'buy_volume_usd': max(0.0, totals['buy_volume_usd']),
+            'sell_volume_usd': max(0.0, totals['sell_volume_usd']),
+            'buys': int(round(totals['buys'])),
+            'sells': int(round(totals['sells'])),
+            'vwap': totals['volume_usd'] / totals['amount0'] if totals['amount0'] > 0 else 0.0,
+            'open': open_price,
+            'close': close_price,
+            'change': (close_price / open_price - 1.0) * 100.0 if open_price > 0 else 0.0,
+        }
+
+
+# Least-squares velocity of bonding-curve progress over a rolling window, from running sums
+# (O(1) per sample and per eviction), and the projected time to 100%
+class CurveTracker:
+    def __init__(self, window_seconds=None):
+        self.window = window_seconds or Config.CURVE_VELOCITY_WINDOW
+        self._samples = deque()
+        self._origin = None
+        self._n = 0
+        self._st = self._sp = self._stt = self._stp = 0.0
+        self.progress = 0.0
+        self.curve_position = 0
+        self.updated_at = None
+
+    def _apply(self, t, progress, sign):
+        self._n += sign
+        self._st += sign * t
+        self._sp += sign * progress
+        self._stt += sign * t * t
+        self._stp += sign * t * progress
+
+    def add(self, timestamp, progress, curve_position=0):
+        if progress <= 0:
+            return
+        if self._origin is None:
+            self._origin = timestamp
+        if self.updated_at is None or timestamp >= self.updated_at:
+            self.progress = progress
+            self.curve_position = curve_position or self.curve_position
+            self.updated_at = timestamp
+        t = float(timestamp - self._origin)
+        self._samples.append((t, progress))
+        self._apply(t, progress, 1)
+        cutoff = t - self.window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._apply(*self._samples.popleft(), -1)
+
+    # Progress percentage points per second
+    def velocity(self):
+        if self._n < 2:
+            return 0.0
+        denominator = self._n * self._stt - self._st * self._st
+        if denominator <= 1e-9:
+            return 0.0
+        return (self._n * self._stp - self._st * self._sp) / denominator
+
+    def projection(self):
+        velocity = self.velocity()
+        remaining = max(0.0, 100.0 - self.progress)
+        eta = remaining / velocity if velocity > 0 and remaining > 0 else None
+        return {
+            'progress': self.progress,
+            'curve_position': self.curve_position,
+            'velocity_per_hour': velocity * 3600.0,
+            'eta_seconds': eta,
+            'completes_at': self.updated_at + eta if eta is not None else None,
+        }
+
+
+# Rolling stats for one token, fresh to its last ingested trade
+class TokenAnalytics:
+    def __init__(self):
+        self.windows = {name: RollingWindow(seconds) for name, seconds in WINDOWS.items()}
+        self.curve = CurveTracker()
+        self.last_price = 0.0
+        self.last_trade_at = None
+        # Oldest moment the local history reaches back to; windows longer than that are incomplete
+        self.history_start = None
+        self.version = 0
+
+    def add(self, timestamp, price, volume_usd, amount0, is_buy, progress=0.0, curve_position=0):
+        for window in self.windows.values():
+            window.add(timestamp, price, volume_usd, amount0, is_buy)
+        self.curve.add(timestamp, progress, curve_position)
+        if price > 0 and (self.last_trade_at is None or timestamp >= self.last_trade_at):
+            self.last_price = price
+            self.last_trade_at = timestamp
+        if self.history_start is None or timestamp < self.history_start:
+            self.history_start = timestamp
+        self.version += 1
+
+    def stats(self, now=None):
+        now = int(now or time.time())
+        windows = {}
+        for name, window in self.windows.items():
+            windows[name] = window.stats(now)
+            windows[name]['covered'] = self.history_start is not None and self.history_start <= now - window.window
+        return {
+            'windows': windows,
+            'curve': self.curve.projection(),
+            'price': self.last_price,
+            'last_trade_at': self.last_trade_at,
+            'version': self.version,
+        }
+
+
+# Incremental analytics for every watched token, fed by the ingest listeners
+class AnalyticsEngine:
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def _token(self, token_address):
+        analytics = self._tokens.get(token_address)
+        if analytics is None:
+            analytics = self._tokens[token_address] = TokenAnalytics()
+        return analytics
+
+    def add_trades(self, token_address, trades):
+        with self._lock:
+            analytics = self._token(token_address)
+            for trade in trades:
+                analytics.add(
+                    trade.block_timestamp, trade.price_usd, trade.volume_usd, trade.amount0, trade.is_buy,
+                    trade.progress, trade.curve_position,
+                )
+
+    # Replay the last 24h of a columnar TradeBuffer, oldest first
+    def rebuild(self, token_address, buffer, now=None):
+        since = int(now or time.time()) - max(WINDOWS.values())
+        columns = [buffer.column(name) for name in
+                   ('block_timestamp', 'price_usd', 'volume_usd', 'amount0', 'side', 'progress')]
+        mask = columns[0] >= since
+        order = np.argsort(columns[0][mask], kind='stable')
+        rows = zip(*(column[mask][order].tolist() for column in columns))
+        with self._lock:
+            analytics = self._tokens[token_address] = TokenAnalytics()
+            for timestamp, price, volume_usd, amount0, side, progress in rows:
+                analytics.add(timestamp, price, volume_usd, amount0, side == BUY, progress)
+            # Trades older than the longest window mean the store's history covers all of it
+            if len(columns[0]) and columns[0].min() < since:
+                analytics.history_start = since
+        logger.info(f"Rolling analytics for {token_address} rebuilt from {int(mask.sum())} trades")
+
+    # None until the token has seen a trade
+    def stats(self, token_address, now=None):
+        with self._lock:
+            analytics = self._tokens.get(token_address)
+            if analytics is None or analytics.last_trade_at is None:
+                return None
+            return analytics.stats(now)
+
+
+_analytics_engine = None
+_analytics_lock = threading.Lock()
+
+
+def get_analytics_engine():
+    global _analytics_engine
+    if _analytics_engine is None:
+        with _analytics_lock:
+            if _analytics_engine is None:
+                _analytics_engine = AnalyticsEngine()
+    return _analytics_engine
@@ -0,0 +1,239 @@
+import argparse
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import Config
+from fetchers import get_trades_between
+from prices import get_price_oracle, value_trades
+from scheduler import get_request_budget
+from snapshot import get_token_snapshot
+from store import get_trade_store
+from telemetry import BACKFILL_TRADES
+from trades import Trade
+
+logger = logging.getLogger(__name__)
+
+MAX_CONSECUTIVE_FAILURES = 5
+
+
+# Parts of [start, end) not covered by the (sorted) done ranges
+def uncovered(start, end, done):
+    gaps = []
+    position = start
+    for done_start, done_end in done:
+        if done_end <= position:
+            continue
+        if done_start >= end:
+            break
+        if done_start > position:
+            gaps.append((position, done_start))
+        position = max(position, done_end)
+    if position < end:
+        gaps.append((position, end))
+    return gaps
+
+
+# Launch time from the token's pair creation, or BACKFILL_MAX_DAYS ago when the token endpoint lacks it
+def launch_timestamp(chain_id, address, now=None):
+    now = now or time.time()
+    try:
+        created_ms = get_token_snapshot(chain_id, address).raw.get('pairCreatedAt')
+        if created_ms:
+            return int(created_ms) // 1000
+    except Exception as e:
+        logger.error(f"Error reading launch time of {address}: {e}")
+    return int(now - Config.BACKFILL_MAX_DAYS * 86400)
+
+
+# Walks a token's trade history back to launch. Time slices are fetched in parallel under the shared
+# request budget; a full page means the slice is too dense and it is split in half. Trades are written
+# in bulk along with the slices they complete, so an interrupted run resumes from the store.
+class Backfill:
+    def __init__(self, chain_id, address, start=None, end=None, store=None, budget=None, workers=None,
+                 slice_seconds=None, page_limit=None, batch_size=None, on_progress=None):
+        self.chain_id = chain_id
+        self.address = address
+        self.start = start
+        self.end = end
+        self.store = store or get_trade_store()
+        self.budget = budget or get_request_budget()
+        self.workers = workers or Config.BACKFILL_WORKERS
+        self.slice_seconds = slice_seconds or Config.BACKFILL_SLICE_SECONDS
+        self.page_limit = page_limit or Config.BACKFILL_PAGE_LIMIT
+        self.batch_size = batch_size or Config.BACKFILL_BATCH_SIZE
+        self.on_progress = on_progress
+        self.trades_written = 0
+        self.pages = 0
+        self.total_seconds = 0
+        self.covered_seconds = 0
+        self.started_at = None
+        self._covered_this_run = 0
+        self._last_report = 0.0
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    # Newest slices first, so recent history (what the charts and leaderboards show) fills in first
+    def plan(self):
+        done = self.store.backfill_slices(self.chain_id, self.address)
+        gaps = uncovered(self.start, self.end, done)
+        self.total_seconds = self.end - self.start
+        self.covered_seconds = self.total_seconds - sum(end - start for start, end in gaps)
+        slices = []
+        for gap_start, gap_end in reversed(gaps):
+            slice_end = gap_end
+            while slice_end > gap_start:
+                slice_start = max(gap_start, slice_end - self.slice_seconds)
+                slices.append((slice_start, slice_end))
+                slice_end = slice_start
+        return slices
+
+    # Leaves live polling BACKFILL_BUDGET_RESERVE requests of headroom
+    def _acquire(self):
+        while self.budget.available() < Config.BACKFILL_BUDGET_RESERVE + 1:
+            if self._stop.wait(0.5):
+                return False
+        self.budget.acquire(1)
+        return True
+
+    def _fetch(self, start, end):
+        if not self._acquire():
+            return None
+        page = get_trades_between(self.chain_id, self.address, start, end, self.page_limit)
+        return [Trade.from_json(trade) for trade in page if trade.get('txnId')]
+
+    def _handle(self, start, end, trades, pending, batch, done_slices):
+        self.pages += 1
+        in_range = [trade for trade in trades if start <= trade.block_timestamp < end]
+        if trades and not in_range:
+            raise RuntimeError(
+                f"Upstream ignored the time range {start}-{end}; check BACKFILL_TRADES_URL"
+            )
+        if len(trades) >= self.page_limit and end - start > 1:
+            # Too many trades for one page: split and fetch both halves next
+            middle = (start + end) // 2
+            pending.appendleft((start, middle))
+            pending.appendleft((middle, end))
+            return
+        if len(trades) >= self.page_limit:
+            logger.warning(f"Over {self.page_limit} trades in second {start}; some may be missing")
+        batch.extend(in_range)
+        done_slices.append((start, end, len(in_range)))
+
+    def _flush(self, batch, done_slices):
+        if not done_slices:
+            return
+        # Past prices are sparser than live ones: hourly samples for ranges over a day
+        inserted = self.store.record_backfill(
+            self.chain_id, self.address, value_trades(batch, max_age=3600), done_slices,
+        )
+        covered = sum(end - start for start, end, _ in done_slices)
+        self.covered_seconds += covered
+        self._covered_this_run += covered
+        self.trades_written += inserted
+        BACKFILL_TRADES.inc(inserted, token=self.address)
+        batch.clear()
+        done_slices.clear()
+
+    def progress(self):
+        elapsed = max(1e-9, time.monotonic() - self.started_at) if self.started_at else 0.0
+        remaining = self.total_seconds - self.covered_seconds
+        eta = elapsed * remaining / self._covered_this_run if self._covered_this_run else None
+        return {
+            'token': self.address,
+            'trades': self.trades_written,
+            'pages': self.pages,
+            'trades_per_second': self.trades_written / elapsed if elapsed else 0.0,
+            'covered': self.covered_seconds / self.total_seconds if self.total_seconds else 1.0,
+            'eta_seconds': eta,
+        }
+
+    def _report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < 5:
+            return
+        self._last_report = now
+        progress = self.progress()
+        eta = f"{progress['eta_seconds']:.0f}s" if progress['eta_seconds'] is not None else 'unknown'
+        logger.info(
+            f"Backfill {self.address}: {progress['trades']} trades, {progress['covered']:.1%} of history, "
+            f"{progress['trades_per_second']:.0f} trades/s, ETA {eta}"
+        )
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    def run(self):
+        self.end = int(self.end or time.time())
+        if self.start is None:
+            self.start = launch_timestamp(self.chain_id, self.address, self.end)
+        try:
+            get_price_oracle().load_history('solana', self.start, self.end)
+        except Exception as e:
+            logger.error(f"Error loading price history, keeping upstream USD values: {e}")
+
+        pending = deque(self.plan())
+        logger.info(f"Backfilling {self.address} over {len(pending)} slices from {self.start} to {self.end}")
+        self.started_at = time.monotonic()
+        batch, done_slices = [], []
+        inflight = {}
+        failures = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as executor:
+            try:
+                while pending or inflight:
+                    while pending and len(inflight) < self.workers and not self._stop.is_set():
+                        start, end = pending.popleft()
+                        inflight[executor.submit(self._fetch, start, end)] = (start, end)
+                    if not inflight:
+                        break
+                    finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        start, end = inflight.pop(future)
+                        try:
+                            trades = future.result()
+                        except Exception as e:
+                            # The transport already retried; requeue the slice unless the upstream keeps failing
+                            failures += 1
+                            if failures >= MAX_CONSECUTIVE_FAILURES:
+                                raise
+                            logger.error(f"Error fetching backfill slice {start}-{end}: {e}")
+                            pending.append((start, end))
+                            continue
+                        failures = 0
+                        if trades is None:
+                            continue
+                        self._handle(start, end, trades, pending, batch, done_slices)
+                    if len(batch) >= self.batch_size or not inflight:
+                        self._flush(batch, done_slices)
+                    self._report()
+            finally:
+                self._stop.set()
+                # Checkpoint what completed before a failure or interrupt
+                self._flush(batch, done_slices)
+        self._report(force=True)
+        return self.progress()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill a token's trade history into the local store")
+    parser.add_argument('address', nargs='?', default=Config.TOKEN_ADDRESS, help='token address')
+    parser.add_argument('--chain', default=Config.CHAIN_ID)
+    parser.add_argument('--start', type=int, help='oldest block timestamp (default: launch)')
+    parser.add_argument('--end', type=int, help='newest block timestamp (default: now)')
+    parser.add_argument('--workers', type=int, default=Config.BACKFILL_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+    backfill = Backfill(args.chain, args.address, start=args.start, end=args.end, workers=args.workers)
+    try:
+        backfill.run()
+    except KeyboardInterrupt:
+        backfill.stop()
+        logger.info("Interrupted; progress is checkpointed and the next run resumes from it")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config import Config
+
+logger = logging.getLogger('bench')
+
+BENCH_TOKEN = '123456:BENCH'
+BENCH_CHAT_ID = -1000000000000
+
+# Alerts link the full maker address; digests only show the largest maker as XXXX...YYYY
+MAKER_LINK = re.compile(r"address/(\d{4}x+\d{4})'")
+DIGEST = re.compile(r"👾 (\d+) .* largest (\d{4})\.\.\.(\d{4})")
+
+
+def load_seed_trades(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data.get('data', []) if isinstance(data, dict) else data
+
+
+# Unbounded synthetic trade stream cycled from seed trades; trade i is released at start + i / rate
+class SyntheticTrades:
+    def __init__(self, seed, count, rate, start=None):
+        self.seed = seed
+        self.count = count
+        self.rate = rate
+        self.start = start or time.time()
+        self.block_base = 300_000_000
+
+    # The trade index is encoded in the first and last four characters so digests stay traceable
+    @staticmethod
+    def maker(index):
+        digits = f"{index:08d}"
+        return f"{digits[:4]}{'x' * 36}{digits[4:]}"
+
+    @staticmethod
+    def index_of(maker):
+        return int(maker[:4] + maker[-4:])
+
+    def released_at(self, index):
+        return self.start + index / self.rate
+
+    def released(self, now=None):
+        return min(self.count, int(((now or time.time()) - self.start) * self.rate))
+
+    def trade(self, index):
+        trade = dict(self.seed[index % len(self.seed)])
+        trade['txnId'] = f"bench{index}"
+        trade['maker'] = self.maker(index)
+        trade['blockNumber'] = self.block_base + index
+        trade['blockTimestamp'] = int(self.released_at(index))
+        return trade
+
+    # Newest-first page, like /trades/v1/latest
+    def page(self, size, now=None):
+        newest = self.released(now)
+        return [self.trade(index) for index in range(newest - 1, max(-1, newest - 1 - size), -1)]
+
+    # Newest-first page of released trades with start <= blockTimestamp < end, for backfills
+    def between(self, start, end, size, now=None):
+        first = max(0, math.ceil((start - self.start) * self.rate))
+        newest = min(self.released(now), max(0, math.ceil((end - self.start) * self.rate)))
+        trades = (self.trade(index) for index in range(newest - 1, first - 1, -1))
+        return [trade for trade in trades if start <= trade['blockTimestamp'] < end][:size]
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency=0.0):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up early (closed trade streams, shutdown) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, payload):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The trade stream hangs up once it reaches known trades
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _MoonshotHandler(_JsonHandler):
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if parts[:2] == ['token', 'v1'] and len(parts) == 4:
+            self.server.count('token')
+            self.reply(200, self.server.token_json(parts[3]))
+        elif parts[:3] == ['trades', 'v1', 'latest'] and len(parts) == 5 and '?' in parts[4]:
+            self.server.count('trades_range')
+            query = parse_qs(urlsplit(self.path).query)
+            start, end = int(query['startTimestamp'][0]), int(query['endTimestamp'][0])
+            size = int(query.get('limit', [self.server.page_size])[0])
+            self.reply(200, {'data': self.server.trades.between(start, end, size)})
+        elif parts[:3] == ['trades', 'v1', 'latest'] and len(parts) == 5:
+            self.server.count('trades')
+            self.reply(200, {'data': self.server.trades.page(self.server.page_size)})
+        elif self.path.startswith('/simple/price'):
+            self.server.count('price')
+            self.reply(200, {'solana': {'usd': self.server.sol_usd, 'last_updated_at': int(time.time())}})
+        else:
+            self.reply(404, {'error': 'not found'})
+
+
+# Stand-in for the Moonshot /token and /trades endpoints, plus the CoinGecko SOL/USD lookup
+class StubMoonshot(_StubServer):
+    def __init__(self, trades, page_size, latency=0.0):
+        super().__init__(_MoonshotHandler, latency)
+        self.trades = trades
+        self.page_size = page_size
+        # SOL/USD implied by the first seed trade, so locally valued trades match the recorded ones
+        seed = trades.seed[0]
+        native = float(seed.get('priceNative') or 0)
+        self.sol_usd = float(seed.get('priceUsd') or 0) / native if native else 150.0
+
+    def token_json(self, address):
+        last = self.trades.seed[0]
+        return {
+            'baseToken': {'address': address, 'name': 'Bench', 'symbol': 'BENCH'},
+            'priceUsd': last.get('priceUsd', '0'),
+            'marketCap': 100000,
+            'volume': {window: {'total': 0} for window in ('m5', 'h1', 'h6', 'h24')},
+            'priceChange': {window: 0 for window in ('m5', 'h1', 'h6', 'h24')},
+            'url': f"https://dexscreener.com/solana/{address}",
+            'profile': {'links': ['https://example.com'], 'banner': ''},
+        }
+
+
+# Bot API calls answered without recording a delivery (getMe resolves the username for /command@bot)
+STATIC_RESULTS = {
+    'getMe': {'id': 123456, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'},
+    'getMyCommands': [],
+    'setWebhook': True,
+    'deleteWebhook': True,
+}
+
+
+class _TelegramHandler(_JsonHandler):
+    def do_POST(self):
+        received_at = time.time()
+        method = self.path.rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        try:
+            params = json.loads(body or b'{}')
+        except ValueError:
+            # Multipart upload; the bench only sends media by URL or file_id
+            params = {}
+        self.server.count(method)
+        if method in STATIC_RESULTS:
+            self.reply(200, {'ok': True, 'result': STATIC_RESULTS[method]})
+            return
+        self.server.record(received_at, method, params)
+        message = {
+            'message_id': sum(self.server.calls.values()),
+            'date': int(received_at),
+            'chat': {'id': int(params.get('chat_id') or 0), 'type': 'supergroup', 'title': 'bench'},
+        }
+        if method == 'sendVideo':
+            message['video'] = {
+                'file_id': 'bench-video', 'file_unique_id': 'bench-video',
+                'width': 1, 'height': 1, 'duration': 1,
+            }
+        else:
+            message['text'] = params.get('text', '')
+        self.reply(200, {'ok': True, 'result': message})
+
+
+# Stand-in for the Bot API that timestamps every delivered alert
+class StubTelegram(_StubServer):
+    def __init__(self, latency=0.0):
+        super().__init__(_TelegramHandler, latency)
+        self.deliveries = []
+
+    @property
+    def api_base(self):
+        return f"{self.url}/bot"
+
+    def record(self, received_at, method, params):
+        if method == 'sendMessage':
+            with self._lock:
+                self.deliveries.append((received_at, params.get('text', '')))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100.0 * len(values)))]
+
+
+# Wire the stubs into Config before any bot module builds sessions, queues or stores
+def configure(args, moonshot, telegram_stub, workdir):
+    Config.BASE_URL = moonshot.url
+    Config.PRICE_API_BASE = moonshot.url
+    Config.TELEGRAM_API_BASE = telegram_stub.api_base
+    Config.TELEGRAM_TOKEN = BENCH_TOKEN
+    Config.TELEGRAM_CHAT_ID = str(BENCH_CHAT_ID)
+    Config.TOKEN_ADDRESS = moonshot.trades.seed[0].get('asset0Id') or 'BENCHTOKEN'
+    Config.TRADE_DB_PATH = os.path.join(workdir, 'bench.db')
+    Config.WATCHLIST_FILE = os.path.join(workdir, 'watchlist.json')
+    Config.MEDIA_CACHE_FILE = os.path.join(workdir, 'media_cache.json')
+    Config.SUBSCRIPTIONS_FILE = os.path.join(workdir, 'subscriptions.json')
+    Config.POLL_MIN_INTERVAL = args.poll_interval
+    Config.POLL_MAX_INTERVAL = max(args.poll_interval, Config.POLL_MAX_INTERVAL)
+    Config.POLL_REQUEST_BUDGET = args.budget
+    if args.telegram_rate:
+        Config.TELEGRAM_GLOBAL_RATE = args.telegram_rate
+        Config.TELEGRAM_GROUP_RATE = args.telegram_rate * 60
+    # Extra subscriber chats for fan-out
+    chats = [BENCH_CHAT_ID - i for i in range(1, args.chats)]
+    with open(Config.WATCHLIST_FILE, 'w') as f:
+        json.dump([{'chain': Config.CHAIN_ID, 'address': Config.TOKEN_ADDRESS, 'chats': chats}], f)
+
+
+def run(args):
+    # Daemon threads may still hold the store open at exit, so cleanup errors are ignored
+    with tempfile.TemporaryDirectory(prefix='glitchbot-bench-', ignore_cleanup_errors=True) as workdir:
+        return replay(args, workdir)
+
+
+def replay(args, workdir):
+    seed = load_seed_trades(args.seed)
+    trades = SyntheticTrades(seed, args.trades, args.rate)
+    moonshot = StubMoonshot(trades, args.page_size, latency=args.upstream_latency / 1000.0).start()
+    telegram_stub = StubTelegram(latency=args.telegram_latency / 1000.0).start()
+    configure(args, moonshot, telegram_stub, workdir)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    started = time.time()
+    trades.start = started
+
+    # The poller half of the bot (watch engine -> ingestor -> notifier) against the stubs
+    from bootstrap import Application
+    from outbox import get_send_queue
+
+    ingested = []
+    application = Application('all')
+    engine = application.engine
+    engine.add_listener(lambda token, new_trades: ingested.append((time.time(), len(new_trades))))
+    application.start_poller()
+
+    replay_seconds = args.trades / args.rate
+    deadline = started + replay_seconds + args.poll_interval * 2
+    while time.time() < deadline:
+        time.sleep(0.1)
+    engine.stop()
+    replay_end = time.time()
+
+    send_queue = get_send_queue()
+    drain_deadline = time.time() + args.drain
+    while send_queue.depth() and time.time() < drain_deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+
+    return report(args, trades, moonshot, telegram_stub, ingested, started, replay_end, send_queue.depth(), application.timings)
+
+
+def report(args, trades, moonshot, telegram_stub, ingested, started, replay_end, undelivered, timings):
+    latencies = []
+    alerted = 0
+    for received_at, text in list(telegram_stub.deliveries):
+        match = MAKER_LINK.search(text)
+        if match:
+            latencies.append(received_at - trades.released_at(trades.index_of(match.group(1))))
+            alerted += 1
+            continue
+        match = DIGEST.search(text)
+        if match:
+            # The digest is late for every buy it covers; its largest buy is the traceable one
+            latencies.append(received_at - trades.released_at(int(match.group(2) + match.group(3))))
+            alerted += int(match.group(1))
+
+    ingested_total = sum(count for _, count in ingested)
+    upstream_calls = sum(moonshot.calls.values())
+    # Throughput from the first announced batch, so startup and the priming poll are not counted
+    first_ingest = ingested[0][0] if ingested else started
+    elapsed = max(1e-9, replay_end - first_ingest)
+    results = {
+        'trades_released': trades.released(replay_end),
+        'trades_ingested': ingested_total,
+        'startup_seconds': first_ingest - started,
+        'startup_phases': {phase: round(seconds, 3) for phase, seconds in timings.items()},
+        'trades_per_second': ingested_total / elapsed,
+        'alerts_delivered': alerted,
+        'telegram_messages': len(telegram_stub.deliveries),
+        'telegram_calls': dict(telegram_stub.calls),
+        'undelivered_messages': undelivered,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p90_ms': percentile(latencies, 90) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'latency_max_ms': max(latencies, default=0.0) * 1000,
+        'upstream_calls': dict(moonshot.calls),
+        'upstream_calls_per_alert': upstream_calls / alerted if alerted else None,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+    if tracemalloc.is_tracing():
+        results['python_heap_peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0)
+        tracemalloc.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay synthetic trades through the bot against local stub servers')
+    parser.add_argument('--seed', default='moonshot.json', help='recorded trades the stream is cycled from')
+    parser.add_argument('--trades', type=int, default=2000, help='trades to replay')
+    parser.add_argument('--rate', type=float, default=200.0, help='trades released per second')
+    parser.add_argument('--page-size', type=int, default=100, help='trades per /trades page')
+    parser.add_argument('--poll-interval', type=float, default=0.25, help='minimum poll interval in seconds')
+    parser.add_argument('--budget', type=int, default=6000, help='upstream requests per minute')
+    parser.add_argument('--chats', type=int, default=1, help='subscribed chats per alert')
+    parser.add_argument('--telegram-rate', type=float, default=0, help='override Telegram messages per second')
+    parser.add_argument('--upstream-latency', type=float, default=0.0, help='stub Moonshot latency in ms')
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help='stub Telegram latency in ms')
+    parser.add_argument('--drain', type=float, default=10.0, help='seconds to wait for queued alerts after replay')
+    parser.add_argument('--trace-memory', action='store_true', help='also report the Python heap peak (slower)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=args.log_level)
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:,.2f}"
+        print(f"{key:28} {value}")
+
+
+if __name__ == '__main__':
+    main()
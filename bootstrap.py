@@ -0,0 +1,192 @@
+import argparse
+import logging
+import threading
+import time
+
+# Cold start is measured from here, before any of the bot's own modules are imported
+PROCESS_STARTED = time.monotonic()
+
+from config import Config
+from telemetry import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# 'poller' ingests trades and sends alerts, 'commands' answers chats, 'all' does both in one process
+ROLES = ('all', 'poller', 'commands')
+
+
+def configure_logging(level=None):
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=getattr(logging, level or Config.LOG_LEVEL, logging.DEBUG),
+    )
+
+
+# Builds the bot's components on first use and times each one, so a process only imports and starts what
+# its role needs. Split roles share the SQLite store, the watchlist and subscription files, and the
+# poller's snapshots and trade cursors through a shared-memory segment (see sharedstate.py).
+class Application:
+    def __init__(self, role='all'):
+        if role not in ROLES:
+            raise ValueError(f"Unknown role '{role}', expected one of {', '.join(ROLES)}")
+        self.role = role
+        self.timings = {}
+        self.webhook_server = None
+        self._components = {}
+        self._lock = threading.RLock()
+
+    def _component(self, name, build):
+        with self._lock:
+            if name not in self._components:
+                started = time.monotonic()
+                self._components[name] = build()
+                self._record(name, time.monotonic() - started)
+            return self._components[name]
+
+    def _record(self, phase, seconds):
+        self.timings[phase] = seconds
+        STARTUP_SECONDS.set(seconds, role=self.role, phase=phase)
+
+    @property
+    def transport(self):
+        def build():
+            from transport import get_transport
+            return get_transport()
+        return self._component('transport', build)
+
+    @property
+    def store(self):
+        def build():
+            from store import get_trade_store
+            return get_trade_store()
+        return self._component('store', build)
+
+    # Send queue and broadcaster for alerts
+    @property
+    def notifier(self):
+        def build():
+            from outbox import get_send_queue
+            from subscriptions import get_broadcaster
+            get_send_queue()
+            return get_broadcaster()
+        return self._component('notifier', build)
+
+    # Watch engine with the watchlist loaded and every token's indexes warm; only the poller alerts
+    @property
+    def engine(self):
+        def build():
+            from metrics import prepare_watch_engine
+            return prepare_watch_engine(notify=self.role != 'commands')
+        return self._component('engine', build)
+
+    @property
+    def updater(self):
+        def build():
+            from telegram.ext import Updater
+            from bot import register_handlers
+            # Command workers share the bot's connection pool
+            updater = Updater(
+                Config.TELEGRAM_TOKEN, base_url=Config.TELEGRAM_API_BASE, use_context=True,
+                request_kwargs={'con_pool_size': Config.COMMAND_WORKERS + 4},
+            )
+            register_handlers(updater.dispatcher)
+            return updater
+        return self._component('updater', build)
+
+    # Watchlist and subscription changes saved by the command process
+    def _sync_files(self):
+        from metrics import warm_indexes
+        from subscriptions import get_subscription_registry
+        for token in self.engine.sync():
+            warm_indexes(token.address)
+        get_subscription_registry().reload()
+
+    def _build_publisher(self):
+        from sharedstate import StatePublisher
+        publisher = StatePublisher(self.engine)
+        publisher.add_tick(self._sync_files)
+        return publisher.start()
+
+    # The command process indexes the poller's trades in memory; wallet aggregates are already in the store
+    def _build_follower(self):
+        from metrics import index_trades_in_memory
+        from sharedstate import StateFollower
+        return StateFollower(self.engine, on_trades=index_trades_in_memory).start()
+
+    def start_poller(self):
+        self.transport
+        self.store
+        self.notifier
+        engine = self.engine
+        if self.role == 'poller':
+            self._component('publisher', self._build_publisher)
+        if Config.BACKFILL_ON_START:
+            from metrics import start_backfill
+            for token in list(engine.tokens.values()):
+                start_backfill(token)
+        threading.Thread(target=engine.run, name='watch-engine', daemon=True).start()
+        return engine
+
+    def start_commands(self):
+        updater = self.updater
+        if self.role == 'commands':
+            self.engine
+            self._component('follower', self._build_follower)
+
+        def warm():
+            from news import get_news_service
+            from prices import get_price_oracle
+            # Load the news and prices before the first /news or /price arrives
+            get_news_service()
+            get_price_oracle()
+        self._component('feeds', warm)
+
+        def ingress():
+            from ingress import start_webhook
+            from telemetry import create_app
+            self.webhook_server = start_webhook(create_app(), updater.dispatcher) if Config.WEBHOOK_URL else None
+            if self.webhook_server is None:
+                updater.start_polling()
+        self._component('ingress', ingress)
+        return updater
+
+    def start(self):
+        if self.role in ('all', 'poller'):
+            self.start_poller()
+        if self.role in ('all', 'commands'):
+            self.start_commands()
+        port = Config.POLLER_METRICS_PORT if self.role == 'poller' else Config.METRICS_PORT
+        # /metrics is already served by the webhook app when both share a port
+        if port and not (self.webhook_server and port == Config.WEBHOOK_PORT):
+            from telemetry import start_metrics_server
+            start_metrics_server(port=port)
+        self._record('ready', time.monotonic() - PROCESS_STARTED)
+        phases = ', '.join(f"{phase} {seconds:.3f}s" for phase, seconds in self.timings.items())
+        logger.info(f"Started role '{self.role}': {phases}")
+        return self
+
+    def run(self):
+        self.start()
+        if 'updater' in self._components and self.webhook_server is None:
+            self.updater.idle()
+            return
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            if self.webhook_server is not None:
+                self.webhook_server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Glitchbot, or one of its roles as a separate process")
+    parser.add_argument(
+        '--role', choices=ROLES, default='all',
+        help="'poller' and 'commands' run side by side on the same store and watchlist (default: all)",
+    )
+    args = parser.parse_args(argv)
+    configure_logging()
+    Application(args.role).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,36 @@
+import io
 import logging
-import requests
-import threading
+import math
 import time
-import telegram
-from news import get_latest_news
-from telegram import Update, ParseMode, Bot
-from telegram.ext import Updater, CommandHandler, CallbackContext
-from metrics import shared_data, fetch_and_store_token_data, fetch_and_store_latest_trades, get_latest_trades_for_token
+from news import get_news_service
+from prices import get_price_oracle
+from telegram import Update, ParseMode
+from telegram.error import BadRequest
+from telegram.ext import CommandHandler, CallbackContext
+from metrics import BUY_VIDEO_URL, current_snapshot
 from config import Config
+from snapshot import get_token_snapshot
+from watch import get_watch_engine, is_token_address, normalize_chat_id
+from media import get_media_cache, is_invalid_file_error
+from store import WALLET_ORDERS, get_trade_store
+from whales import WINDOWS as WHALE_WINDOWS, get_whale_index
+from candles import INTERVALS as CANDLE_INTERVALS, get_candle_engine, get_chart_cache
+from analytics import get_analytics_engine
+from wallets import get_wallet_index
+from telemetry import COMMAND_LATENCY
+from ingress import get_command_pool
+from responses import get_response_cache
+from subscriptions import get_subscription_registry
+from outbox import get_send_queue
 
-# Initialize the bot with the Telegram token
-bot = Bot(token=Config.TELEGRAM_TOKEN)
-
-# Enable logging for the bot
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.DEBUG
-)
+# Importing this module has no side effects; bootstrap.py builds the updater and registers the handlers
 logger = logging.getLogger(__name__)
 
 # Function to send a message to the configured Telegram chat group
 def send_message_to_group(message):
     try:
-        bot.send_message(chat_id=Config.TELEGRAM_CHAT_ID, text=message)
-        logger.info(f"Sent message to group: {message}")
+        get_send_queue().send_message(Config.TELEGRAM_CHAT_ID, message)
+        logger.info(f"Queued message to group: {message}")
     except Exception as e:
         logger.error(f"Error sending message to group: {e}")
 
@@ -36,49 +44,138 @@ def help_command(update: Update, context: CallbackContext) -> None:
     help_text = (
         "/start - Digital howdy! Beep boop!\n"
         "/headroom - HEADROOM token info. Get the skinny!\n"
-        "/news - Latest Solana buzz. Extra, extra!\n"
+        "/news [topic] - Latest Solana buzz. Extra, extra!\n"
         "/price - Current SOL price. Cha-ching!\n"
-        "/subscribe - Toggle notifications for new buys.\n"
+        "/subscribe [buys|sells|all] [min_usd] [token_address] - Buy/sell alerts for this chat. Ka-ching!\n"
+        "/unsubscribe - Turn alerts off for this chat.\n"
         "/transactions - Latest transactions. Splash!\n"
         "/help - List of commands. Help is here!\n"
-        "/whales - Large transactions. Whale watching!\n"
-        "/chart [token_symbol] - Token price chart. Highs, lows, drama!\n"
+        "/whales [1h|24h|7d] [min_usd] - Large transactions. Whale watching!\n"
+        "/leaderboard [holders|buyers|volume] - Top wallets. Who's stacking?\n"
+        "/wallet [address] - One wallet's buys and sells.\n"
+        "/chart [1m|5m|1h|1d] [token_symbol] - Token price chart. Highs, lows, drama!\n"
+        "/watch [token_address] - Watch another token for buys. Eyes on!\n"
+        "/unwatch [token_address] - Stop watching a token.\n"
+        "/watchlist - Tokens this chat is watching.\n"
     )
     update.message.reply_text(help_text)
 
+# Reply templates, formatted once per data version and shared by every chat
+HEADROOM_TEMPLATE = (
+    "👾 Token: {token_name} ({token_symbol})\n"
+    "💸 Market Cap: ${market_cap:,.0f}\n"
+    "👟 Volume 24h: ${volume_24h:,.0f} 6h: ${volume_6h:,.0f} 1h: ${volume_1h:,.0f} 5m: {volume_5m:,.0f}\n"
+    "📈 Change 24h: {change_24h:.2f}% 6h: {change_6h:.2f}% 1h: {change_1h:.2f}% 5m: {change_5m:.2f}%\n"
+    "🏦 Total Supply: {total_supply} 💰Price: {current_price:.6f}\n"
+    "🌙 <a href='{token_url}'>Moonshot</a> 🌐 <a href='{website_url}'>Website</a>\n"
+    "<a href='https://solanabeach.io/address/{token_address}'>{token_address}</a>\n"
+)
+
+# Extra /headroom lines from the local rolling analytics
+FLOW_TEMPLATE = "🔁 24h Buys: {buys_24h} Sells: {sells_24h} 1h: {buys_1h}/{sells_1h} VWAP 1h: {vwap_1h:.8f}\n"
+CURVE_TEMPLATE = "🔥 Curve: {progress:.2f}% (+{velocity_per_hour:.2f}%/h){eta}\n"
+
+LATEST_BUY_TEMPLATE = (
+    "👾👾👾 HEADROOM BUY! 👾👾👾\n"
+    "💵 Spent: ${volume_usd:,.2f} 💰 Purchased: {amount0} {token_name}\n"
+    "👤 Wallet: <a href='https://solanabeach.io/address/{maker}'>{short_maker}</a>\n"
+    "🌙 <a href='{token_url}'>Moonshot</a> 🔥 Progress: {progress}% 🌐 <a href='{website_url}'>Website</a>\n"
+    " <a href='{token_url}'>{pair_id}</a>\n"
+)
+
+def format_duration(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 48:
+        return f"{hours}h {minutes}m"
+    return f"{hours // 24}d {hours % 24}h"
+
+# Volume and price change come from the local rolling analytics for each window the local history fully
+# covers, and price once they have seen trades, so they are fresh to the last trade; the snapshot supplies
+# metadata and the windows local history is still too short for
+def render_headroom(snapshot, stats=None):
+    figures = {
+        'market_cap': snapshot.market_cap,
+        'current_price': snapshot.current_price,
+        'volume_24h': snapshot.volume_24h,
+        'volume_6h': snapshot.volume_6h,
+        'volume_1h': snapshot.volume_1h,
+        'volume_5m': snapshot.volume_5m,
+        'change_24h': snapshot.change_24h,
+        'change_6h': snapshot.change_6h,
+        'change_1h': snapshot.change_1h,
+        'change_5m': snapshot.change_5m,
+    }
+    if stats is not None:
+        windows = stats['windows']
+        for name, window in windows.items():
+            if not window['covered']:
+                continue
+            figures[f'volume_{name}'] = window['volume_usd']
+            figures[f'change_{name}'] = window['change']
+        if stats['price'] > 0:
+            if snapshot.current_price > 0:
+                figures['market_cap'] = snapshot.market_cap * stats['price'] / snapshot.current_price
+            figures['current_price'] = stats['price']
+
+    message = HEADROOM_TEMPLATE.format(
+        token_name=snapshot.token_name,
+        token_symbol=snapshot.token_symbol,
+        total_supply=snapshot.raw.get('totalSupply', '1B'),
+        token_url=snapshot.token_url,
+        website_url=snapshot.website_url,
+        token_address=Config.TOKEN_ADDRESS,
+        **figures,
+    )
+    if stats is None:
+        return message
+
+    message += FLOW_TEMPLATE.format(
+        buys_24h=windows['24h']['buys'], sells_24h=windows['24h']['sells'],
+        buys_1h=windows['1h']['buys'], sells_1h=windows['1h']['sells'],
+        vwap_1h=windows['1h']['vwap'],
+    )
+    curve = stats['curve']
+    if curve['progress'] > 0:
+        eta = f" ~{format_duration(curve['eta_seconds'])} to completion" if curve['eta_seconds'] else ""
+        message += CURVE_TEMPLATE.format(
+            progress=curve['progress'], velocity_per_hour=curve['velocity_per_hour'], eta=eta,
+        )
+    return message
+
+# Latest buy from the local trade history, or None if there is none yet
+def render_latest_buy(snapshot):
+    buy_trades = get_trade_store().latest_trades(Config.TOKEN_ADDRESS, limit=1, trade_type='buy')
+    if not buy_trades:
+        return None
+    latest_trade = buy_trades[0]
+    maker = latest_trade.maker
+    return LATEST_BUY_TEMPLATE.format(
+        volume_usd=latest_trade.volume_usd,
+        amount0=int(latest_trade.amount0),  # Convert amount0 to integer
+        token_name=snapshot.token_name,
+        maker=maker,
+        short_maker=f"{maker[:4]}...{maker[-4:]}",
+        token_url=snapshot.token_url,
+        progress=latest_trade.progress,
+        website_url=snapshot.website_url,
+        pair_id=latest_trade.pair_id,
+    )
+
 # Command handler for /headroom
 def headroom(update: Update, context: CallbackContext) -> None:
     try:
-        fetch_and_store_token_data()
-        token_data = shared_data['token_data']
-        token_name = shared_data['token_name']
-        token_symbol = shared_data['token_symbol']
-        market_cap = float(shared_data['market_cap'])
-        volume_24h = float(shared_data['volume_24h'])
-        volume_6h = float(shared_data['volume_6h'])
-        volume_1h = float(shared_data['volume_1h'])
-        volume_5m = float(shared_data['volume_5m'])
-        change_24h = float(shared_data['change_24h'])
-        change_6h = float(shared_data['change_6h'])
-        change_1h = float(shared_data['change_1h'])
-        change_5m = float(shared_data['change_5m'])
-        total_supply = shared_data['total_supply']
-        current_price = float(shared_data['current_price'])
-        banner_url = shared_data['token_banner']
-        token_url = shared_data['token_url']
-        website_url = shared_data['website_url']
-
-        context.bot.send_photo(chat_id=update.effective_chat.id, photo=banner_url)
-
-        message = (
-            f"👾 Token: {token_name} ({token_symbol})\n"
-            f"💸 Market Cap: ${market_cap:,.0f}\n"
-            f"👟 Volume 24h: ${volume_24h:,.0f} 6h: ${volume_6h:,.0f} 1h: ${volume_1h:,.0f} 5m: {volume_5m:,.0f}\n"
-            f"📈 Change 24h: {change_24h:.2f}% 6h: {change_6h:.2f}% 1h: {change_1h:.2f}% 5m: {change_5m:.2f}%\n"
-            f"🏦 Total Supply: {total_supply} 💰Price: {current_price:.6f}\n"
-            f"🌙 <a href='{token_url}'>Moonshot</a> 🌐 <a href='{website_url}'>Website</a>\n"
-            f"<a href='https://solanabeach.io/address/{Config.TOKEN_ADDRESS}'>{Config.TOKEN_ADDRESS}</a>\n"
-        )
+        # Live figures come from the rolling analytics; the token endpoint is only needed for metadata then
+        stats = get_analytics_engine().stats(Config.TOKEN_ADDRESS)
+        snapshot = get_token_snapshot(max_age=Config.TOKEN_METADATA_TTL if stats else None)
+        # Concurrent callers share one snapshot refresh and one rendered reply per data version;
+        # the 5-second slot lets rolling windows age out between trades
+        version = (snapshot.version, stats['version'] if stats else None, int(time.time()) // 5)
+        message = get_response_cache().get(('headroom',), version, lambda: render_headroom(snapshot, stats))
+
+        get_media_cache().send(context.bot, 'send_photo', chat_id=update.effective_chat.id, photo=snapshot.token_banner)
 
         update.message.reply_text(message, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
         logger.info("Displayed HEADROOM token information.")
@@ -86,18 +183,27 @@ def headroom(update: Update, context: CallbackContext) -> None:
         logger.error(f"Error in headroom command: {e}")
         update.message.reply_text("An error occurred while fetching headroom information.")
 
+def render_news(news_items):
+    return "\n\n".join(
+        [f"📰 <a href='{item['url']}'>{item['title']}</a>\n{item['description']}" for item in news_items]
+    )
+
 # Command handler for /news
 def news(update: Update, context: CallbackContext) -> None:
     try:
-        news_items = get_latest_news()
+        # Articles come from memory; the news service refreshes them in the background
+        service = get_news_service()
+        topic = context.args[0].lower() if context.args else None
+        if topic and topic not in service.feeds:
+            update.message.reply_text(f"Unknown topic. Try one of: {', '.join(service.feeds)}")
+            return
+        news_items = service.latest(topic, limit=3)
 
         if not news_items:
             update.message.reply_text("No news available at the moment.")
             return
 
-        news_message = "\n\n".join(
-            [f"📰 <a href='{item['url']}'>{item['title']}</a>\n{item['description']}" for item in news_items[:3]]
-        )
+        news_message = get_response_cache().get(('news', topic), service.version, lambda: render_news(news_items))
         update.message.reply_text(news_message, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
     except Exception as e:
         logger.error(f"Error in news command: {e}")
@@ -106,112 +212,342 @@ def news(update: Update, context: CallbackContext) -> None:
 # Command handler for /price
 def price(update: Update, context: CallbackContext) -> None:
     try:
-        response = requests.get("https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd")
-        response.raise_for_status()
-        solana_price = response.json().get("solana", {}).get("usd", 0.0)
-        
-        message = f"💲 Current Solana Price: ${solana_price:.4f}"
+        # Served from the price oracle, which refreshes in the background
+        quote = get_price_oracle().quote('solana')
+        if quote is None:
+            update.message.reply_text("The Solana price is not available right now.")
+            return
+
+        message = f"💲 Current Solana Price: ${quote.usd:.4f}"
         update.message.reply_text(message)
     except Exception as e:
         logger.error(f"Error in price command: {e}")
         update.message.reply_text("An error occurred while fetching the Solana price.")
 
-# Command handler for /subscribe
-notifications_enabled = True
+# Why a chat may not watch a token (bad address, over a cap, unknown upstream), or None if it may.
+# Costs at most one snapshot fetch, made before anything is persisted.
+def watch_refusal(address, chain_id, chat_id):
+    if not is_token_address(address, chain_id):
+        return f"{address} is not a valid {chain_id} token address."
+    engine = get_watch_engine()
+    token = engine.get(address, chain_id)
+    if token is not None and normalize_chat_id(chat_id) in token.subscribers:
+        return None
+    if len(engine.watched_by(chat_id)) >= Config.WATCH_MAX_PER_CHAT:
+        return f"This chat already watches {Config.WATCH_MAX_PER_CHAT} tokens. /unwatch one first."
+    if token is not None:
+        return None
+    if len(engine.tokens) >= Config.WATCH_MAX_TOKENS:
+        return "The watchlist is full. Try again later."
+    try:
+        get_token_snapshot(chain_id, address)
+    except Exception as e:
+        logger.info(f"Refusing to watch {chain_id}/{address}: {e}")
+        return f"Couldn't find token {address} on {chain_id}."
+    return None
 
+# Command handler for /subscribe [buys|sells|all] [min_usd] [token_address] [off]
 def subscribe(update: Update, context: CallbackContext) -> None:
-    global notifications_enabled
-    notifications_enabled = not notifications_enabled
-    status = "enabled" if notifications_enabled else "disabled"
-    update.message.reply_text(f"Notifications have been {status}.")
+    chat_id = update.effective_chat.id
+    registry = get_subscription_registry()
+    changes = {'enabled': True}
+    tokens = []
+    for arg in context.args or []:
+        option = arg.lower()
+        if option in ('buy', 'buys'):
+            changes.update(buys=True, sells=False)
+        elif option in ('sell', 'sells'):
+            changes.update(buys=False, sells=True)
+        elif option in ('all', 'both'):
+            changes.update(buys=True, sells=True)
+        elif option == 'off':
+            changes['enabled'] = False
+        elif is_token_address(arg):
+            tokens.append(arg)
+        else:
+            try:
+                min_usd = float(arg.lstrip('$').replace(',', ''))
+            except ValueError:
+                update.message.reply_text(
+                    f"Unknown option or token address: {arg}. "
+                    "Usage: /subscribe [buys|sells|all] [min_usd] [token_address] [off]"
+                )
+                return
+            if not math.isfinite(min_usd) or min_usd < 0:
+                update.message.reply_text("The minimum must be a positive amount of USD, e.g. /subscribe 100")
+                return
+            changes['min_usd'] = min_usd
 
-# Command handler for /transactions
-def transactions(update: Update, context: CallbackContext) -> None:
+    if not changes['enabled']:
+        # Opting out leaves the watchlist alone, and tokens given alongside 'off' are not added
+        update.message.reply_text(registry.update(chat_id, **changes).describe())
+        return
+    for address in tokens:
+        refusal = watch_refusal(address, Config.CHAIN_ID, chat_id)
+        if refusal:
+            update.message.reply_text(refusal)
+            return
+    current = registry.get(chat_id)
+    if not tokens and (current is None or not current.tokens):
+        if not Config.TOKEN_ADDRESS:
+            update.message.reply_text(
+                "No default token is configured. Usage: /subscribe [buys|sells|all] [min_usd] token_address"
+            )
+            return
+        tokens = [Config.TOKEN_ADDRESS]
     try:
-        fetch_and_store_token_data()
-        latest_trades = get_latest_trades_for_token()
+        engine = get_watch_engine()
+        for address in tokens:
+            engine.watch(address, chat_id=chat_id)
+        subscription = registry.update(chat_id, tokens=tokens, **changes)
+        update.message.reply_text(subscription.describe())
+    except Exception as e:
+        logger.error(f"Error in subscribe command: {e}")
+        update.message.reply_text("An error occurred while updating notifications.")
 
-        if not latest_trades:
-            update.message.reply_text("No recent transactions found.")
-            return
+# Command handler for /unsubscribe
+def unsubscribe(update: Update, context: CallbackContext) -> None:
+    subscription = get_subscription_registry().update(update.effective_chat.id, enabled=False)
+    update.message.reply_text(subscription.describe())
 
-        # Filter out only 'buy' transactions and sort by blockTimestamp
-        buy_trades = [trade for trade in latest_trades if trade.get('type') == 'buy']
-        if not buy_trades:
-            update.message.reply_text("No recent buy transactions found.")
+# Command handler for /transactions
+def transactions(update: Update, context: CallbackContext) -> None:
+    try:
+        snapshot = get_token_snapshot()
+        # The ingestion cursor only moves when new trades are stored, so it versions the reply
+        cursor = get_trade_store().load_cursor(Config.CHAIN_ID, Config.TOKEN_ADDRESS)
+        message = get_response_cache().get(
+            ('transactions',), (cursor, snapshot.version), lambda: render_latest_buy(snapshot)
+        )
+        if message is None:
+            if not get_trade_store().count_trades(Config.TOKEN_ADDRESS):
+                update.message.reply_text("No recent transactions found.")
+            else:
+                update.message.reply_text("No recent buy transactions found.")
             return
 
-        latest_trade = max(buy_trades, key=lambda trade: trade.get('blockTimestamp', 0))
-
-        dex_id = latest_trade.get('dexId', 'N/A')
-        block_number = latest_trade.get('blockNumber', 'N/A')
-        block_timestamp = latest_trade.get('blockTimestamp', 'N/A')
-        pair_id = latest_trade.get('pairId', 'N/A')
-        asset0_id = latest_trade.get('asset0Id', 'N/A')
-        asset1_id = latest_trade.get('asset1Id', 'N/A')
-        txn_id = latest_trade.get('txnId', 'N/A')
-        maker = latest_trade.get('maker', 'N/A')
-        txn_type = latest_trade.get('type', 'N/A')
-        amount0 = int(float(latest_trade.get('amount0', 0)))  # Convert amount0 to integer
-        amount1 = latest_trade.get('amount1', 'N/A')
-        price_native = latest_trade.get('priceNative', 'N/A')
-        price_usd = latest_trade.get('priceUsd', 'N/A')
-        volume_usd = latest_trade.get('volumeUsd', 'N/A')
-        metadata = latest_trade.get('metadata', {})
-        progress = metadata.get('progress', 'N/A')
-        curve_position = latest_trade.get('curvePosition', 'N/A')
-
-        token_name = shared_data.get('token_name', 'N/A')
-        token_url = shared_data.get('token_url', '')
-        website_url = shared_data.get('website_url', '')
-
-        context.bot.send_video(
-            chat_id=update.effective_chat.id,
-            video='https://cdn.glitch.global/ffa82557-90ab-436a-9585-9e6791f55285/582b8583-2440-4c96-aa3e-6de061b74b86.mp4?v=1721053375683'
-        )
-        
-        message = (
-            f"👾👾👾 HEADROOM BUY! 👾👾👾\n"
-            f"💵 Spent: ${volume_usd} 💰 Purchased: {amount0} {token_name}\n"
-            f"👤 Wallet: <a href='https://solanabeach.io/address/{maker}'>{maker[:4]}...{maker[-4:]}</a>\n"
-            f"🌙 <a href='{token_url}'>Moonshot</a> 🔥 Progress: {progress}% 🌐 <a href='{website_url}'>Website</a>\n"
-            f" <a href='{token_url}'>{pair_id}</a>\n"
-        )
+        get_media_cache().send(context.bot, 'send_video', chat_id=update.effective_chat.id, video=BUY_VIDEO_URL)
 
         update.message.reply_text(message, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
     except Exception as e:
         logger.error(f"Error in transactions command: {e}")
         update.message.reply_text("An error occurred while fetching transactions information.")
 
+# Command handler for /watch <token_address> [chain]
+def watch(update: Update, context: CallbackContext) -> None:
+    if not context.args:
+        update.message.reply_text("Please specify a token address. Usage: /watch [token_address] [chain]")
+        return
+    address = context.args[0]
+    chain_id = context.args[1] if len(context.args) > 1 else Config.CHAIN_ID
+    refusal = watch_refusal(address, chain_id, update.effective_chat.id)
+    if refusal:
+        update.message.reply_text(refusal)
+        return
+    try:
+        get_watch_engine().watch(address, chain_id, chat_id=update.effective_chat.id)
+        get_subscription_registry().update(update.effective_chat.id, tokens=[address], enabled=True)
+        update.message.reply_text(f"Watching {address} on {chain_id} for new buys.")
+    except Exception as e:
+        logger.error(f"Error in watch command: {e}")
+        update.message.reply_text("An error occurred while adding the token to the watchlist.")
+
+# Command handler for /unwatch <token_address> [chain]
+def unwatch(update: Update, context: CallbackContext) -> None:
+    if not context.args:
+        update.message.reply_text("Please specify a token address. Usage: /unwatch [token_address] [chain]")
+        return
+    address = context.args[0]
+    chain_id = context.args[1] if len(context.args) > 1 else Config.CHAIN_ID
+    get_subscription_registry().remove_token(update.effective_chat.id, address)
+    if get_watch_engine().unwatch(address, chain_id, chat_id=update.effective_chat.id):
+        update.message.reply_text(f"Stopped watching {address}.")
+    else:
+        update.message.reply_text(f"{address} is not on the watchlist.")
+
+# Command handler for /watchlist
+def watchlist(update: Update, context: CallbackContext) -> None:
+    tokens = get_watch_engine().watched_by(update.effective_chat.id)
+    if not tokens:
+        update.message.reply_text("This chat is not watching any tokens. Use /watch [token_address] to add one.")
+        return
+    lines = []
+    for token in tokens:
+        snapshot = token.snapshot()
+        name = f"{snapshot.token_name} ({snapshot.token_symbol})" if snapshot else token.address
+        lines.append(f"👀 {name} - {token.chain_id}/{token.address}")
+    update.message.reply_text("\n".join(lines))
+
+# Name or symbol of the configured token for reply text
+def token_label(attribute='token_name', default='N/A'):
+    snapshot = current_snapshot()
+    return getattr(snapshot, attribute) if snapshot is not None else default
+
 # Command handler for /whales
 def whales(update: Update, context: CallbackContext) -> None:
-    update.message.reply_text("Feature coming soon!")
+    args = context.args or []
+    window = args[0].lower() if args else '24h'
+    if window not in WHALE_WINDOWS:
+        update.message.reply_text(f"Unknown window. Usage: /whales [{'|'.join(WHALE_WINDOWS)}] [min_usd]")
+        return
+    try:
+        min_usd = float(args[1].lstrip('$')) if len(args) > 1 else 0.0
+    except ValueError:
+        update.message.reply_text("Please give the minimum as a number. Usage: /whales [window] [min_usd]")
+        return
 
-# Command handler for /chart
-def chart(update: Update, context: CallbackContext) -> None:
-    token_symbol = ' '.join(context.args).upper()
-    if not token_symbol:
-        update.message.reply_text("Please specify a token symbol. Usage: /chart [token_symbol]")
+    whale_trades = get_whale_index().top(Config.TOKEN_ADDRESS, window, min_usd=min_usd)
+    if not whale_trades:
+        update.message.reply_text(f"No whale trades in the last {window}. The ocean is calm.")
+        return
+
+    token_name = token_label()
+    threshold = f", ≥ ${min_usd:,.0f}" if min_usd else ""
+    lines = [f"🐳 Top whales ({window}{threshold}):"]
+    for rank, trade in enumerate(whale_trades, 1):
+        maker = trade.maker
+        lines.append(
+            f"{rank}. ${trade.volume_usd:,.2f} {trade.type} {int(trade.amount0):,} {token_name} "
+            f"<a href='https://solanabeach.io/address/{maker}'>{maker[:4]}...{maker[-4:]}</a>"
+        )
+    update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+
+def short_address(address):
+    return f"<a href='https://solanabeach.io/address/{address}'>{address[:4]}...{address[-4:]}</a>"
+
+# Command handler for /leaderboard [holders|buyers|volume]
+def leaderboard(update: Update, context: CallbackContext) -> None:
+    args = context.args or []
+    order = args[0].lower() if args else 'holders'
+    if order not in WALLET_ORDERS:
+        update.message.reply_text(f"Unknown leaderboard. Usage: /leaderboard [{'|'.join(WALLET_ORDERS)}]")
+        return
+    try:
+        wallets = get_wallet_index().top(Config.TOKEN_ADDRESS, order)
+    except Exception as e:
+        logger.error(f"Error in leaderboard command: {e}")
+        update.message.reply_text("An error occurred while building the leaderboard.")
         return
-    update.message.reply_text(f"Token price chart for {token_symbol}. Highs, lows, drama!")
+    if not wallets:
+        update.message.reply_text("No wallets have traded yet.")
+        return
+
+    token_name = token_label()
+    titles = {'holders': 'Top holders (net bought)', 'buyers': 'Top buyers', 'volume': 'Top traders by volume'}
+    lines = [f"🏆 {titles[order]}:"]
+    for rank, wallet in enumerate(wallets, 1):
+        if order == 'volume':
+            figure = f"${wallet['volume_usd']:,.2f}"
+        else:
+            figure = f"{int(wallet['net' if order == 'holders' else 'bought']):,} {token_name}"
+        lines.append(f"{rank}. {figure} {short_address(wallet['maker'])} ({wallet['buys']}B/{wallet['sells']}S)")
+    update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+
+# Command handler for /wallet [address]
+def wallet(update: Update, context: CallbackContext) -> None:
+    if not context.args:
+        update.message.reply_text("Please provide a wallet address. Usage: /wallet [address]")
+        return
+    maker = context.args[0]
+    try:
+        stats = get_wallet_index().wallet(Config.TOKEN_ADDRESS, maker)
+    except Exception as e:
+        logger.error(f"Error in wallet command: {e}")
+        update.message.reply_text("An error occurred while looking up the wallet.")
+        return
+    if stats is None:
+        update.message.reply_text("That wallet has not traded this token.")
+        return
+
+    token_name = token_label()
+    first_seen = time.strftime('%Y-%m-%d %H:%M', time.gmtime(stats['first_seen']))
+    last_seen = time.strftime('%Y-%m-%d %H:%M', time.gmtime(stats['last_seen']))
+    message = (
+        f"👤 Wallet {short_address(maker)}\n"
+        f"🟢 Bought: {int(stats['bought']):,} {token_name} for {stats['sol_spent']:,.4f} SOL ({stats['buys']} buys)\n"
+        f"🔴 Sold: {int(stats['sold']):,} {token_name} for {stats['sol_received']:,.4f} SOL ({stats['sells']} sells)\n"
+        f"📦 Net: {int(stats['net']):,} {token_name} 💵 Volume: ${stats['volume_usd']:,.2f}\n"
+        f"🕰 First seen {first_seen} UTC, last seen {last_seen} UTC"
+    )
+    update.message.reply_text(message, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+
+# Command handler for /chart [interval] [token_symbol]
+def chart(update: Update, context: CallbackContext) -> None:
+    interval = '5m'
+    token_symbol = ''
+    for arg in context.args or []:
+        if arg.lower() in CANDLE_INTERVALS:
+            interval = arg.lower()
+        else:
+            token_symbol = arg.upper()
+
+    token_address = Config.TOKEN_ADDRESS
+    if token_symbol:
+        matches = [
+            token for token in get_watch_engine().tokens.values()
+            if token.snapshot() is not None and token.snapshot().token_symbol.upper() == token_symbol
+        ]
+        if not matches:
+            update.message.reply_text(f"Not watching any token with symbol {token_symbol}. Usage: /chart [interval] [token_symbol]")
+            return
+        token_address = matches[0].address
+        title = f"{token_symbol} {interval}"
+    else:
+        title = f"{token_label('token_symbol', 'HEADROOM')} {interval}"
+
+    try:
+        if not get_candle_engine().bar_count(token_address, interval):
+            update.message.reply_text("No trades to chart yet. Highs, lows, drama... soon!")
+            return
+        _, entry = get_chart_cache().get(token_address, interval, title)
+        caption = f"📈 {title}. Highs, lows, drama!"
+        file_id = entry['file_id']
+        message = None
+        if file_id:
+            try:
+                message = context.bot.send_photo(chat_id=update.effective_chat.id, photo=file_id, caption=caption)
+            except BadRequest as e:
+                if not is_invalid_file_error(e):
+                    raise
+                logger.warning(f"Cached chart file_id rejected, re-uploading: {e}")
+                entry['file_id'] = None
+        if message is None:
+            message = context.bot.send_photo(
+                chat_id=update.effective_chat.id, photo=io.BytesIO(entry['png']), caption=caption,
+            )
+            if message and message.photo:
+                entry['file_id'] = message.photo[-1].file_id
+    except Exception as e:
+        logger.error(f"Error in chart command: {e}")
+        update.message.reply_text("An error occurred while rendering the chart.")
+
+# CommandHandler whose callback runs on the bounded command pool and is timed per command
+def command_handler(name, callback, **kwargs):
+    timed = COMMAND_LATENCY.timed(callback, command=name)
+    return CommandHandler(name, get_command_pool().wrap(name, timed), **kwargs)
+
+# Register every chat command on a dispatcher
+def register_handlers(dispatcher):
+    dispatcher.add_handler(command_handler("start", start))
+    dispatcher.add_handler(command_handler("headroom", headroom))
+    dispatcher.add_handler(command_handler("news", news, pass_args=True))
+    dispatcher.add_handler(command_handler("price", price))
+    dispatcher.add_handler(command_handler("subscribe", subscribe, pass_args=True))
+    dispatcher.add_handler(command_handler("unsubscribe", unsubscribe))
+    dispatcher.add_handler(command_handler("transactions", transactions))
+    dispatcher.add_handler(command_handler("help", help_command))
+    dispatcher.add_handler(command_handler("whales", whales, pass_args=True))
+    dispatcher.add_handler(command_handler("leaderboard", leaderboard, pass_args=True))
+    dispatcher.add_handler(command_handler("wallet", wallet, pass_args=True))
+    dispatcher.add_handler(command_handler("chart", chart, pass_args=True))
+    dispatcher.add_handler(command_handler("watch", watch, pass_args=True))
+    dispatcher.add_handler(command_handler("unwatch", unwatch, pass_args=True))
+    dispatcher.add_handler(command_handler("watchlist", watchlist))
 
-# Function to set up the bot and add command handlers
 def main() -> None:
-    updater = Updater(Config.TELEGRAM_TOKEN, use_context=True)
-    dispatcher = updater.dispatcher
-
-    dispatcher.add_handler(CommandHandler("start", start))
-    dispatcher.add_handler(CommandHandler("headroom", headroom))
-    dispatcher.add_handler(CommandHandler("news", news))
-    dispatcher.add_handler(CommandHandler("price", price))
-    dispatcher.add_handler(CommandHandler("subscribe", subscribe))
-    dispatcher.add_handler(CommandHandler("transactions", transactions))
-    dispatcher.add_handler(CommandHandler("help", help_command))
-    dispatcher.add_handler(CommandHandler("whales", whales))
-    dispatcher.add_handler(CommandHandler("chart", chart, pass_args=True))
-
-    updater.start_polling()
-    updater.idle()
+    # Poller and commands in one process; see bootstrap.py for running them separately
+    import bootstrap
+    bootstrap.main()
 
 if __name__ == '__main__':
     # Run the bot
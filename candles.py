@@ -0,0 +1,240 @@
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from config import Config
+from telemetry import cache_result
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = {
+    '1m': 60,
+    '5m': 300,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+
+# OHLCV bars for one token and interval, keyed by bucket start time
+class CandleSeries:
+    def __init__(self, interval_seconds, max_bars=None):
+        self.interval = interval_seconds
+        self.max_bars = max_bars or Config.CANDLE_MAX_BARS
+        # bucket_start -> [open, high, low, close, volume, first_ts, last_ts]
+        self.bars = OrderedDict()
+        self.version = 0
+
+    def add(self, timestamp, price, volume):
+        if price <= 0:
+            return
+        start = timestamp - timestamp % self.interval
+        bar = self.bars.get(start)
+        if bar is None:
+            self.bars[start] = [price, price, price, price, volume, timestamp, timestamp]
+            if next(reversed(self.bars)) != start:
+                # Late trade opened an older bar; keep bars in time order
+                self.bars = OrderedDict(sorted(self.bars.items()))
+            while len(self.bars) > self.max_bars:
+                self.bars.popitem(last=False)
+        else:
+            if timestamp < bar[5]:
+                bar[0], bar[5] = price, timestamp
+            if timestamp >= bar[6]:
+                bar[3], bar[6] = price, timestamp
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[4] += volume
+        self.version += 1
+
+    # Replace every bar from column arrays in one vectorized pass
+    def rebuild(self, timestamps, prices, volumes):
+        mask = prices > 0
+        timestamps, prices, volumes = timestamps[mask], prices[mask], volumes[mask]
+        self.bars = OrderedDict()
+        self.version += 1
+        if not len(timestamps):
+            return
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, prices, volumes = timestamps[order], prices[order], volumes[order]
+        buckets = timestamps - timestamps % self.interval
+        starts, first = np.unique(buckets, return_index=True)
+        last = np.append(first[1:], len(buckets)) - 1
+        opens = prices[first]
+        closes = prices[last]
+        highs = np.maximum.reduceat(prices, first)
+        lows = np.minimum.reduceat(prices, first)
+        totals = np.add.reduceat(volumes, first)
+        keep = slice(max(0, len(starts) - self.max_bars), None)
+        for row in zip(starts[keep].tolist(), opens[keep].tolist(), highs[keep].tolist(), lows[keep].tolist(),
+                       closes[keep].tolist(), totals[keep].tolist(), timestamps[first][keep].tolist(),
+                       timestamps[last][keep].tolist()):
+            self.bars[row[0]] = list(row[1:])
+
+    def last_bar_start(self):
+        return next(reversed(self.bars)) if self.bars else None
+
+    # Column arrays (start, open, high, low, close, volume) for the most recent `limit` bars
+    def columns(self, limit=None):
+        items = list(self.bars.items())[-limit:] if limit else list(self.bars.items())
+        if not items:
+            return np.empty((6, 0))
+        starts = np.fromiter((start for start, _ in items), dtype=np.float64, count=len(items))
+        values = np.array([bar[:5] for _, bar in items], dtype=np.float64).T
+        return np.vstack([starts, values])
+
+
+# Incrementally maintained candles for every watched token and interval. Readers get copies taken
+# under the lock, since ingest threads mutate the bars.
+class CandleEngine:
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    # Callers hold the lock
+    def _get_series(self, token_address, interval):
+        key = (token_address, interval)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = CandleSeries(INTERVALS[interval])
+        return series
+
+    def add_trades(self, token_address, trades):
+        with self._lock:
+            all_series = [self._get_series(token_address, interval) for interval in INTERVALS]
+            for trade in trades:
+                for series in all_series:
+                    series.add(trade.block_timestamp, trade.price_usd, trade.volume_usd)
+
+    # Rebuild every interval from a columnar TradeBuffer
+    def rebuild(self, token_address, buffer):
+        timestamps = buffer.column('block_timestamp')
+        prices = buffer.column('price_usd')
+        volumes = buffer.column('volume_usd')
+        with self._lock:
+            for interval in INTERVALS:
+                self._get_series(token_address, interval).rebuild(timestamps, prices, volumes)
+
+    def bar_count(self, token_address, interval):
+        with self._lock:
+            return len(self._get_series(token_address, interval).bars)
+
+    def columns(self, token_address, interval, limit=None):
+        with self._lock:
+            return self._get_series(token_address, interval).columns(limit)
+
+    # Cache key component that changes when a bar closes, or when the forming bar's high, low or close
+    # moves by more than CHART_PRICE_DIGITS significant digits
+    def bar_version(self, token_address, interval):
+        with self._lock:
+            bars = self._get_series(token_address, interval).bars
+            if not bars:
+                return (0, None, None, None)
+            iterator = reversed(bars)
+            forming = next(iterator)
+            closed = next(iterator, None)
+            high, low, close = bars[forming][1:4]
+            rounded = tuple(float(f"{price:.{Config.CHART_PRICE_DIGITS}g}") for price in (high, low, close))
+            return (len(bars), closed, bars[closed][3] if closed is not None else None, (forming, rounded))
+
+
+# Candlestick and volume PNG from CandleSeries.columns() output. Uses a standalone Figure rather than
+# pyplot's global state, so charts for different keys can render on several threads at once.
+def render_chart(columns, interval_seconds, title):
+    # Imported lazily: matplotlib is only needed once someone asks for a chart
+    from matplotlib.figure import Figure
+
+    starts, opens, highs, lows, closes, volumes = columns
+    x = np.arange(len(starts))
+    rising = closes >= opens
+    colors = np.where(rising, '#26a69a', '#ef5350')
+
+    fig = Figure(figsize=(8, 5))
+    price_ax, volume_ax = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+    price_ax.vlines(x, lows, highs, colors=colors, linewidth=1)
+    bodies = np.maximum(np.abs(closes - opens), (highs - lows) * 0.01 + 1e-12)
+    price_ax.bar(x, bodies, bottom=np.minimum(opens, closes), color=colors, width=0.7)
+    price_ax.set_title(title)
+    price_ax.grid(alpha=0.2)
+    volume_ax.bar(x, volumes, color=colors, width=0.7)
+    volume_ax.grid(alpha=0.2)
+    if len(starts):
+        ticks = np.linspace(0, len(starts) - 1, min(6, len(starts))).astype(int)
+        volume_ax.set_xticks(ticks)
+        fmt = '%H:%M' if interval_seconds < 86400 else '%m-%d'
+        volume_ax.set_xticklabels(
+            [np.datetime64(int(starts[i]), 's').astype(object).strftime(fmt) for i in ticks]
+        )
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100)
+    return buffer.getvalue()
+
+
+# LRU of rendered charts keyed by (token, interval, title, bar version). Renders run outside the lock,
+# one per key: concurrent requests for the same chart wait for it, while hits and other keys go ahead.
+class ChartRenderCache:
+    def __init__(self, engine, max_entries=None):
+        self.engine = engine
+        self.max_entries = max_entries or Config.CHART_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._rendering = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token_address, interval, title):
+        key = (token_address, interval, title, self.engine.bar_version(token_address, interval))
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    cache_result('chart', True)
+                    return key, entry
+                rendering = self._rendering.get(key)
+                if rendering is None:
+                    rendering = self._rendering[key] = threading.Event()
+                    self.misses += 1
+                    cache_result('chart', False)
+                    break
+            # Another thread is rendering this chart; if it failed, the next pass renders it here
+            rendering.wait()
+
+        try:
+            columns = self.engine.columns(token_address, interval, Config.CHART_BARS)
+            entry = {'png': render_chart(columns, INTERVALS[interval], title), 'file_id': None}
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return key, entry
+        finally:
+            with self._lock:
+                del self._rendering[key]
+            rendering.set()
+
+
+_candle_engine = None
+_render_cache = None
+_candles_lock = threading.Lock()
+
+
+def get_candle_engine():
+    global _candle_engine
+    if _candle_engine is None:
+        with _candles_lock:
+            if _candle_engine is None:
+                _candle_engine = CandleEngine()
+    return _candle_engine
+
+
+def get_chart_cache():
+    global _render_cache
+    if _render_cache is None:
+        with _candles_lock:
+            if _render_cache is None:
+                _render_cache = ChartRenderCache(get_candle_engine())
+    return _render_cache
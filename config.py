@@ -7,10 +7,133 @@ load_dotenv()
 class Config:
     TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
     NEWS_API_KEY = os.getenv('NEWS_TOKEN')
+    # News searches kept in memory and how often they are refreshed (NewsAPI's free tier allows 100 requests a day:
+    # two topics hourly use 48, leaving room for retries); failed fetches retry after a doubling backoff
+    NEWS_TOPICS = [topic.strip() for topic in os.getenv('NEWS_TOPICS', 'memecoin,solana').split(',') if topic.strip()]
+    NEWS_REFRESH_INTERVAL = float(os.getenv('NEWS_REFRESH_INTERVAL', '3600'))
+    NEWS_RETRY_INTERVAL = float(os.getenv('NEWS_RETRY_INTERVAL', '300'))
+    NEWS_RETRY_MAX_INTERVAL = float(os.getenv('NEWS_RETRY_MAX_INTERVAL', '21600'))
+    NEWS_MAX_ARTICLES = int(os.getenv('NEWS_MAX_ARTICLES', '50'))
     TOKEN_ADDRESS = os.getenv('TOKEN_ADDRESS')
     CHAIN_ID = 'solana'
     MOONSHOT_API_BASE = 'https://api.moonshot.cc'
     TOKEN_CREATOR_ADDRESS = os.getenv('TOKEN_CREATOR_ADDRESS')
     BOND_CURVE_ADDRESS = os.getenv('BOND_CURVE_ADDRESS')
     TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-    BASE_URL = os.getenv('BASE_URL') 
+    # Bot API endpoint override (e.g. a local stub server); None uses api.telegram.org
+    TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE')
+    BASE_URL = os.getenv('BASE_URL') or MOONSHOT_API_BASE
+    # Seconds a token snapshot is served before the next upstream refresh
+    TOKEN_CACHE_TTL = float(os.getenv('TOKEN_CACHE_TTL', '15'))
+    # Once rolling analytics cover volume and price change, the token endpoint only supplies metadata
+    TOKEN_METADATA_TTL = float(os.getenv('TOKEN_METADATA_TTL', '300'))
+
+    # Shared HTTP transport (timeouts in seconds)
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+    HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+    HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '8'))
+    HTTP_RETRY_AFTER_MAX = float(os.getenv('HTTP_RETRY_AFTER_MAX', '60'))
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+    # Number of recent txnIds remembered to suppress duplicate alerts
+    INGEST_SEEN_SIZE = int(os.getenv('INGEST_SEEN_SIZE', '10000'))
+    # Adaptive polling: interval bounds in seconds and a global upstream request budget per minute
+    POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', '5'))
+    POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', '60'))
+    POLL_SPEEDUP_FACTOR = float(os.getenv('POLL_SPEEDUP_FACTOR', '0.5'))
+    POLL_BACKOFF_FACTOR = float(os.getenv('POLL_BACKOFF_FACTOR', '1.5'))
+    POLL_REQUEST_BUDGET = int(os.getenv('POLL_REQUEST_BUDGET', '60'))
+    POLL_WORKERS = int(os.getenv('POLL_WORKERS', '8'))
+    # Multi-token watch engine
+    WATCHLIST_FILE = os.getenv('WATCHLIST_FILE', 'watchlist.json')
+    WATCH_WORKERS = int(os.getenv('WATCH_WORKERS', '16'))
+    # Caps on tokens added from chats: the whole watchlist and per chat
+    WATCH_MAX_TOKENS = int(os.getenv('WATCH_MAX_TOKENS', '500'))
+    WATCH_MAX_PER_CHAT = int(os.getenv('WATCH_MAX_PER_CHAT', '10'))
+    # Outbound Telegram queue: Bot API limits and burst coalescing
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+    TELEGRAM_GROUP_RATE = float(os.getenv('TELEGRAM_GROUP_RATE', '20'))
+    TELEGRAM_GROUP_BURST = int(os.getenv('TELEGRAM_GROUP_BURST', '5'))
+    SEND_WORKERS = int(os.getenv('SEND_WORKERS', '4'))
+    SEND_COALESCE_THRESHOLD = int(os.getenv('SEND_COALESCE_THRESHOLD', '5'))
+    SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', '3'))
+    # Telegram file_id cache for re-sent media
+    MEDIA_CACHE_FILE = os.getenv('MEDIA_CACHE_FILE', 'media_cache.json')
+    # SQLite trade history and ingestion cursors
+    TRADE_DB_PATH = os.getenv('TRADE_DB_PATH', 'glitchbot.db')
+    # Whale leaderboards: trades kept per window, and the single-buy USD size that triggers a push alert (0 disables)
+    WHALE_TOP_K = int(os.getenv('WHALE_TOP_K', '10'))
+    WHALE_ALERT_USD = float(os.getenv('WHALE_ALERT_USD', '0'))
+    # Candles and rendered /chart images; the forming bar is re-rendered once its prices move in these
+    # many significant digits
+    CANDLE_MAX_BARS = int(os.getenv('CANDLE_MAX_BARS', '500'))
+    CHART_BARS = int(os.getenv('CHART_BARS', '60'))
+    CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '64'))
+    CHART_PRICE_DIGITS = int(os.getenv('CHART_PRICE_DIGITS', '3'))
+    # Trades retained per token in the in-memory columnar buffer
+    TRADE_BUFFER_SIZE = int(os.getenv('TRADE_BUFFER_SIZE', '100000'))
+    # Streaming trade pages: bytes read from the socket at a time
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '4096'))
+    # Prometheus /metrics endpoint (port 0 disables it)
+    METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+    # Webhook ingress (long polling is used when WEBHOOK_URL is unset or Telegram rejects it)
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    # Command worker pool: size, queue cap, queue-time shedding, and per-command limits like "chart=2,news=2"
+    COMMAND_WORKERS = int(os.getenv('COMMAND_WORKERS', '16'))
+    COMMAND_QUEUE_SIZE = int(os.getenv('COMMAND_QUEUE_SIZE', '500'))
+    COMMAND_MAX_QUEUE_TIME = float(os.getenv('COMMAND_MAX_QUEUE_TIME', '10'))
+    COMMAND_CONCURRENCY = int(os.getenv('COMMAND_CONCURRENCY', '4'))
+    COMMAND_LIMITS = {
+        name.strip(): int(limit)
+        for name, _, limit in (item.partition('=') for item in os.getenv('COMMAND_LIMITS', 'chart=2').split(','))
+        if name.strip() and limit
+    }
+    # Per-chat alert subscriptions, and how many recent broadcasts keep per-chat delivery reports
+    SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE', 'subscriptions.json')
+    BROADCAST_HISTORY = int(os.getenv('BROADCAST_HISTORY', '50'))
+    # USD price oracle: CoinGecko base URL, assets (coin ids or mints) refreshed in the background, ids per
+    # batched lookup, samples kept per asset, and how far a sample may be from a trade's time to value it
+    PRICE_API_BASE = os.getenv('PRICE_API_BASE', 'https://api.coingecko.com/api/v3')
+    PRICE_ASSETS = [asset.strip() for asset in os.getenv('PRICE_ASSETS', 'solana').split(',') if asset.strip()]
+    PRICE_REFRESH_INTERVAL = float(os.getenv('PRICE_REFRESH_INTERVAL', '30'))
+    PRICE_BATCH_SIZE = int(os.getenv('PRICE_BATCH_SIZE', '100'))
+    PRICE_HISTORY_SIZE = int(os.getenv('PRICE_HISTORY_SIZE', '10000'))
+    PRICE_MAX_AGE = float(os.getenv('PRICE_MAX_AGE', '300'))
+    # 'local' values trades (and so candles) as amount1 x the oracle price; 'upstream' keeps Moonshot's USD fields
+    USD_VALUATION = os.getenv('USD_VALUATION', 'local')
+    # Seconds of progress samples used to project bonding-curve completion
+    CURVE_VELOCITY_WINDOW = float(os.getenv('CURVE_VELOCITY_WINDOW', '3600'))
+    # Historical backfill: range-query URL template, trades per page, slice width in seconds, workers,
+    # trades per bulk write, poll budget left for live polling, and how far back to go without a known launch time
+    BACKFILL_TRADES_URL = os.getenv(
+        'BACKFILL_TRADES_URL',
+        '{base}/trades/v1/latest/{chain}/{address}?startTimestamp={start}&endTimestamp={end}&limit={limit}',
+    )
+    BACKFILL_PAGE_LIMIT = int(os.getenv('BACKFILL_PAGE_LIMIT', '100'))
+    BACKFILL_SLICE_SECONDS = int(os.getenv('BACKFILL_SLICE_SECONDS', '3600'))
+    BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '4'))
+    BACKFILL_BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', '5000'))
+    BACKFILL_BUDGET_RESERVE = int(os.getenv('BACKFILL_BUDGET_RESERVE', '10'))
+    BACKFILL_MAX_DAYS = float(os.getenv('BACKFILL_MAX_DAYS', '30'))
+    BACKFILL_ON_START = os.getenv('BACKFILL_ON_START', '').lower() in ('1', 'true', 'yes')
+    # Per-wallet aggregates: wallets with unsaved changes held in memory, seconds between flushes, leaderboard size
+    WALLET_MEMORY_BUDGET = int(os.getenv('WALLET_MEMORY_BUDGET', '50000'))
+    WALLET_FLUSH_INTERVAL = float(os.getenv('WALLET_FLUSH_INTERVAL', '30'))
+    WALLET_LEADERBOARD_SIZE = int(os.getenv('WALLET_LEADERBOARD_SIZE', '10'))
+    # Root logging level, configured once by bootstrap.py
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+    # Split deployment (bootstrap.py --role poller|commands): the shared-memory segment the poller publishes
+    # snapshots and trade cursors to, its size in bytes, seconds between publishes, and the poller's /metrics port
+    SHARED_STATE_NAME = os.getenv('SHARED_STATE_NAME', 'glitchbot-state')
+    SHARED_STATE_SIZE = int(os.getenv('SHARED_STATE_SIZE', str(1 << 20)))
+    SHARED_STATE_INTERVAL = float(os.getenv('SHARED_STATE_INTERVAL', '0.5'))
+    POLLER_METRICS_PORT = int(os.getenv('POLLER_METRICS_PORT', '9101'))
+    # Rendered command replies kept per command/arguments
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))
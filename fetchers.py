@@ -1,101 +1,94 @@
-import requests
 from config import Config
+from snapshot import get_token_snapshot
+from stream import TradeStream
 
-# Fetch token data from Moonshot API
+# Fetch token data from Moonshot API (served from the shared snapshot cache)
 def get_token_data():
-    url = f"{Config.MOONSHOT_API_BASE}/token/v1/{Config.CHAIN_ID}/{Config.TOKEN_ADDRESS}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return get_token_snapshot().raw
+
+# Open the latest trades page for a token as a stream decoded one trade at a time (newest first)
+def stream_latest_trades(chain_id=None, address=None):
+    url = f"{Config.BASE_URL}/trades/v1/latest/{chain_id or Config.CHAIN_ID}/{address or Config.TOKEN_ADDRESS}"
+    return TradeStream(url)
+
+# Trades between two block timestamps (start inclusive, end exclusive), newest first, for backfills
+def get_trades_between(chain_id, address, start, end, limit=None):
+    url = Config.BACKFILL_TRADES_URL.format(
+        base=Config.BASE_URL, chain=chain_id, address=address, start=int(start), end=int(end),
+        limit=limit or Config.BACKFILL_PAGE_LIMIT,
+    )
+    with TradeStream(url) as trades:
+        return list(trades)
 
 # Fetch latest trades for a specified token
-def get_latest_trades_for_token():
-    url = f"{Config.MOONSHOT_API_BASE}/trades/v1/latest/{Config.CHAIN_ID}/{Config.TOKEN_ADDRESS}"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json().get('data', [])
+def get_latest_trades_for_token(chain_id=None, address=None):
+    with stream_latest_trades(chain_id, address) as trades:
+        return list(trades)
 
 # Fetch current price from token data
 def get_current_price():
-    token_data = get_token_data()
-    return token_data.get('priceUsd', 0.0)
+    return get_token_snapshot().current_price
 
 # Fetch token name from token data
 def get_token_name():
-    token_data = get_token_data()
-    return token_data.get('baseToken', {}).get('name', 'N/A')
+    return get_token_snapshot().token_name
 
 # Fetch token symbol from token data
 def get_token_symbol():
-    token_data = get_token_data()
-    return token_data.get('baseToken', {}).get('symbol', 'N/A')
+    return get_token_snapshot().token_symbol
 
 # Fetch market cap from token data
 def get_market_cap():
-    token_data = get_token_data()
-    return token_data.get('marketCap', 0.0)
+    return get_token_snapshot().market_cap
 
 # Fetch 24-hour volume from token data
 def get_24h_volume():
-    token_data = get_token_data()
-    return token_data.get('volume', {}).get('h24', {}).get('total', 0.0)
+    return get_token_snapshot().volume_24h
 
 # Fetch 6-hour volume from token data
 def get_6h_volume():
-    token_data = get_token_data()
-    return token_data.get('volume', {}).get('h6', {}).get('total', 0.0)
+    return get_token_snapshot().volume_6h
 
 # Fetch 1-hour volume from token data
 def get_1h_volume():
-    token_data = get_token_data()
-    return token_data.get('volume', {}).get('h1', {}).get('total', 0.0)
+    return get_token_snapshot().volume_1h
 
 # Fetch 5-minute volume from token data
 def get_5m_volume():
-    token_data = get_token_data()
-    return token_data.get('volume', {}).get('m5', {}).get('total', 0.0)
+    return get_token_snapshot().volume_5m
 
 # Fetch 24-hour price change from token data
 def get_24h_change():
-    token_data = get_token_data()
-    return token_data.get('priceChange', {}).get('h24', 0.0)
+    return get_token_snapshot().change_24h
 
 # Fetch 6-hour price change from token data
 def get_6h_change():
-    token_data = get_token_data()
-    return token_data.get('priceChange', {}).get('h6', 0.0)
+    return get_token_snapshot().change_6h
 
 # Fetch 1-hour price change from token data
 def get_1h_change():
-    token_data = get_token_data()
-    return token_data.get('priceChange', {}).get('h1', 0.0)
+    return get_token_snapshot().change_1h
 
 # Fetch 5-minute price change from token data
 def get_5m_change():
-    token_data = get_token_data()
-    return token_data.get('priceChange', {}).get('m5', 0.0)
+    return get_token_snapshot().change_5m
 
 # Fetch total supply from token data
 def get_total_supply():
-    token_data = get_token_data()
-    return token_data.get('totalSupply', 'N/A')
+    return get_token_snapshot().total_supply
 
 # Fetch liquidity from token data
 def get_liquidity():
-    token_data = get_token_data()
-    return token_data.get('liquidity', {}).get('h24', {}).get('total', 0.0)
+    return get_token_snapshot().liquidity
 
 # Get token creator address
 def get_token_creator():
-    token_data = get_token_data()
-    return token_data.get('moonshot', {}).get('creator', '')
+    return get_token_snapshot().token_creator
 
 # Get token banner URL
 def get_token_banner():
-    token_data = get_token_data()
-    return token_data.get('profile', {}).get('banner', '')
+    return get_token_snapshot().token_banner
 
 # Get token URL
 def get_token_url():
-    token_data = get_token_data()
-    return token_data.get('url', '')
+    return get_token_snapshot().token_url
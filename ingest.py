@@ -0,0 +1,109 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from config import Config
+from trades import Trade
+
+logger = logging.getLogger(__name__)
+
+
+# Position of the newest trade we have ingested
+class TradeCursor(NamedTuple):
+    block_number: int
+    block_timestamp: int
+    txn_id: str
+
+
+# Cheap reads of the raw page entry, so known trades are skipped without being parsed
+def trade_position(trade):
+    if isinstance(trade, Trade):
+        return trade.position
+    return (int(trade.get('blockNumber') or 0), int(trade.get('blockTimestamp') or 0))
+
+
+def trade_txn_id(trade):
+    if isinstance(trade, Trade):
+        return trade.txn_id
+    return trade.get('txnId')
+
+
+# Bounded LRU set of seen txnIds
+class SeenSet:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def __contains__(self, txn_id):
+        return txn_id in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, txn_id):
+        self._items[txn_id] = None
+        self._items.move_to_end(txn_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+# Turns newest-first /trades/v1/latest pages into a stream of unseen, parsed trades in chain order
+class TradeIngestor:
+    def __init__(self, cursor: Optional[TradeCursor] = None, max_seen=None, announce_backlog=False,
+                 seen_txn_ids=(), sink=None):
+        self.cursor = cursor
+        self.seen = SeenSet(max_seen or Config.INGEST_SEEN_SIZE)
+        for txn_id in seen_txn_ids:
+            self.seen.add(txn_id)
+        # Called with (new_trades, cursor) before they are returned, so they are durable before alerting
+        self.sink = sink
+        # Without a cursor the first page is backlog; only announce it if asked to
+        self.announce_backlog = announce_backlog
+        self._lock = threading.Lock()
+
+    def ingest(self, trades):
+        with self._lock:
+            new_trades = []
+            cursor_position = self.cursor[:2] if self.cursor else None
+            for trade in trades:
+                txn_id = trade_txn_id(trade)
+                if not txn_id:
+                    continue
+                position = trade_position(trade)
+                # Pages are newest first, so anything older than the cursor is already known
+                if cursor_position is not None and position < cursor_position:
+                    break
+                if txn_id in self.seen:
+                    # Trades sharing the cursor's block may be listed in any order
+                    if cursor_position is not None and position == cursor_position:
+                        continue
+                    break
+                new_trades.append(trade if isinstance(trade, Trade) else Trade.from_json(trade))
+
+            if not new_trades:
+                return []
+
+            new_trades.reverse()
+            new_trades.sort(key=lambda trade: trade.position)
+            primed = self.cursor is None
+            cursor = self.cursor
+            newest = new_trades[-1]
+            if cursor is None or newest.position >= cursor[:2]:
+                cursor = TradeCursor(newest.block_number, newest.block_timestamp, newest.txn_id)
+            # Persist first: if the sink fails, the trades are offered again on the next poll
+            if self.sink is not None:
+                self.sink(new_trades, cursor)
+
+            self.cursor = cursor
+            for trade in new_trades:
+                self.seen.add(trade.txn_id)
+
+            if primed and not self.announce_backlog:
+                logger.info(f"Trade cursor primed at {self.cursor} with {len(new_trades)} backlog trades")
+                return []
+            logger.debug(f"Ingested {len(new_trades)} new trades, cursor at {self.cursor}")
+            return new_trades
+
+    def new_buys(self, trades):
+        return [trade for trade in self.ingest(trades) if trade.is_buy]
@@ -0,0 +1,176 @@
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from collections import deque
+
+from telegram import Update
+from config import Config
+from telemetry import COMMAND_QUEUE_DEPTH, COMMAND_QUEUE_TIME, COMMANDS_SHED, start_http_server
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ('command', 'function', 'args', 'kwargs', 'enqueued_at')
+
+    def __init__(self, command, function, args, kwargs):
+        self.command = command
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+
+
+# Bounded worker pool for chat commands: per-command concurrency limits, a global queue cap,
+# and jobs that waited longer than max_queue_time are dropped instead of answered late
+class CommandPool:
+    def __init__(self, workers=None, max_queued=None, max_queue_time=None, limits=None, default_limit=None):
+        self.workers = workers or Config.COMMAND_WORKERS
+        self.max_queued = max_queued or Config.COMMAND_QUEUE_SIZE
+        self.max_queue_time = max_queue_time or Config.COMMAND_MAX_QUEUE_TIME
+        self.limits = dict(Config.COMMAND_LIMITS if limits is None else limits)
+        self.default_limit = default_limit or Config.COMMAND_CONCURRENCY
+        self._pending = {}
+        self._running = {}
+        self._order = deque()
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return self
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'command-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        COMMAND_QUEUE_DEPTH.set_function(self.depth)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def depth(self):
+        return self._queued
+
+    def limit(self, command):
+        return self.limits.get(command, self.default_limit)
+
+    def submit(self, command, function, *args, **kwargs):
+        with self._cond:
+            if self._queued >= self.max_queued:
+                COMMANDS_SHED.inc(command=command, reason='queue_full')
+                logger.warning(f"Command queue full, dropping /{command}")
+                return False
+            pending = self._pending.get(command)
+            if pending is None:
+                pending = self._pending[command] = deque()
+                self._running[command] = 0
+                self._order.append(command)
+            pending.append(_Job(command, function, args, kwargs))
+            self._queued += 1
+            self._cond.notify()
+        return True
+
+    # Handler callback that queues the real one; the dispatcher thread returns immediately
+    def wrap(self, command, function):
+        def submit(*args, **kwargs):
+            self.submit(command, function, *args, **kwargs)
+        return submit
+
+    # Round-robin over commands that are under their limit, shedding jobs that waited too long
+    def _next_job(self):
+        with self._cond:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for _ in range(len(self._order)):
+                    command = self._order[0]
+                    self._order.rotate(-1)
+                    pending = self._pending[command]
+                    while pending and now - pending[0].enqueued_at > self.max_queue_time:
+                        pending.popleft()
+                        self._queued -= 1
+                        COMMANDS_SHED.inc(command=command, reason='queue_time')
+                        logger.warning(f"Dropped /{command} after waiting over {self.max_queue_time}s")
+                    if not pending or self._running[command] >= self.limit(command):
+                        continue
+                    job = pending.popleft()
+                    self._queued -= 1
+                    self._running[command] += 1
+                    return job
+                self._cond.wait(1.0)
+        return None
+
+    def _worker(self):
+        while not self._stop.is_set():
+            job = self._next_job()
+            if job is None:
+                return
+            COMMAND_QUEUE_TIME.observe(time.monotonic() - job.enqueued_at, command=job.command)
+            try:
+                job.function(*job.args, **job.kwargs)
+            except Exception as e:
+                logger.error(f"Error running /{job.command}: {e}")
+            finally:
+                with self._cond:
+                    self._running[job.command] -= 1
+                    self._cond.notify_all()
+
+
+_command_pool = None
+_command_pool_lock = threading.Lock()
+
+
+def get_command_pool():
+    global _command_pool
+    if _command_pool is None:
+        with _command_pool_lock:
+            if _command_pool is None:
+                _command_pool = CommandPool().start()
+    return _command_pool
+
+
+# Secret path segment so only Telegram (which was given the full URL) can post updates
+def webhook_secret():
+    if Config.WEBHOOK_SECRET:
+        return Config.WEBHOOK_SECRET
+    return hashlib.sha256(Config.TELEGRAM_TOKEN.encode()).hexdigest()[:32]
+
+
+def register_webhook(app, dispatcher):
+    from flask import abort, request
+
+    secret = webhook_secret()
+
+    @app.route('/webhook/<token>', methods=['POST'])
+    def webhook(token):
+        if not hmac.compare_digest(token, secret):
+            abort(403)
+        data = request.get_json(force=True, silent=True)
+        if not data:
+            abort(400)
+        # Command handlers only queue work on the pool, so this returns to Telegram quickly
+        dispatcher.process_update(Update.de_json(data, dispatcher.bot))
+        return ''
+
+    return app
+
+
+# Serve Telegram updates over a webhook; returns the HTTP server, or None if Telegram refused the URL
+def start_webhook(app, dispatcher, url=None, host=None, port=None):
+    url = (url or Config.WEBHOOK_URL).rstrip('/')
+    register_webhook(app, dispatcher)
+    server = start_http_server(app, host or Config.WEBHOOK_HOST, port or Config.WEBHOOK_PORT, 'webhook-http')
+    try:
+        dispatcher.bot.set_webhook(url=f"{url}/webhook/{webhook_secret()}", max_connections=100)
+    except Exception as e:
+        logger.error(f"Error setting webhook, falling back to polling: {e}")
+        server.shutdown()
+        return None
+    logger.info(f"Receiving updates by webhook at {url}/webhook/...")
+    return server
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import threading
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+from telegram.error import BadRequest
+from config import Config
+from telemetry import cache_result
+
+logger = logging.getLogger(__name__)
+
+# Bot method -> attribute of the returned Message that carries the uploaded media
+MEDIA_METHODS = {
+    'send_video': 'video',
+    'send_photo': 'photo',
+    'send_animation': 'animation',
+    'send_document': 'document',
+}
+
+
+# Fragments of Telegram's BadRequest descriptions that mean the file_id itself is unusable
+INVALID_FILE_ERRORS = ('file identifier', 'file_id', 'file reference', 'wrong type of the web page content')
+
+
+def is_invalid_file_error(error):
+    description = str(error).lower()
+    return any(fragment in description for fragment in INVALID_FILE_ERRORS)
+
+
+def media_key(url, version=None):
+    parts = urlsplit(url)
+    if version is None:
+        # CDN urls carry their content version as ?v=...; fall back to the whole query
+        version = parse_qs(parts.query).get('v', [parts.query])[0]
+    base = urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+    return f"{base}#{version}" if version else base
+
+
+def uploaded_file_id(message, kind):
+    media = getattr(message, kind, None)
+    if isinstance(media, list):
+        # Photos come back as a list of sizes; the last one is the original
+        media = media[-1] if media else None
+    return getattr(media, 'file_id', None)
+
+
+# Telegram file_id cache keyed by media URL and content version, persisted across restarts
+class MediaCache:
+    def __init__(self, path=None):
+        self.path = path or Config.MEDIA_CACHE_FILE
+        self._file_ids = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._file_ids = json.load(f)
+            logger.info(f"Loaded {len(self._file_ids)} cached media file_ids")
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading media cache: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        # Per-process name: processes sharing the cache must not write the same tmp file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._file_ids, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, url, version=None):
+        return self._file_ids.get(media_key(url, version))
+
+    def put(self, url, file_id, version=None):
+        with self._lock:
+            self._file_ids[media_key(url, version)] = file_id
+            self._save()
+
+    def forget(self, url, version=None):
+        with self._lock:
+            if self._file_ids.pop(media_key(url, version), None) is not None:
+                self._save()
+
+    # Send media by cached file_id, uploading from the URL on first use or if Telegram rejects the id
+    def send(self, bot, method, chat_id, version=None, **kwargs):
+        kind = MEDIA_METHODS[method]
+        url = kwargs.pop(kind)
+        if not url:
+            return None
+        send = getattr(bot, method)
+
+        file_id = self.get(url, version)
+        cache_result('media', bool(file_id))
+        if file_id:
+            try:
+                return send(chat_id=chat_id, **{kind: file_id}, **kwargs)
+            except BadRequest as e:
+                # Other rejections (chat not found, caption too long) would fail the upload as well
+                if not is_invalid_file_error(e):
+                    raise
+                logger.warning(f"Cached file_id for {url} rejected, re-uploading: {e}")
+                self.forget(url, version)
+
+        message = send(chat_id=chat_id, **{kind: url}, **kwargs)
+        file_id = uploaded_file_id(message, kind)
+        if file_id:
+            self.put(url, file_id, version)
+        return message
+
+
+_media_cache = None
+_media_cache_lock = threading.Lock()
+
+
+def get_media_cache():
+    global _media_cache
+    if _media_cache is None:
+        with _media_cache_lock:
+            if _media_cache is None:
+                _media_cache = MediaCache()
+    return _media_cache
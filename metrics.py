@@ -1,137 +1,140 @@
 import logging
-import os
 import threading
-import time
 import telegram
-import requests
 from config import Config
-from telegram.ext import Updater
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Initialize the bot and updater with environment variables
-bot = telegram.Bot(token=Config.TELEGRAM_TOKEN)
-updater = Updater(token=Config.TELEGRAM_TOKEN, use_context=True)
-
-TOKEN_URL = f"{Config.BASE_URL}/token/v1/{Config.CHAIN_ID}/{Config.TOKEN_ADDRESS}"
-TRADES_URL = f"{Config.BASE_URL}/trades/v1/latest/{Config.CHAIN_ID}/{Config.TOKEN_ADDRESS}"
-
-# Configuration for logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
-)
+from snapshot import get_token_snapshot
+from watch import get_watch_engine
+from subscriptions import get_broadcaster, get_subscription_registry
+from store import get_trade_store
+from whales import get_whale_index, warm_whale_index
+from candles import get_candle_engine
+from analytics import get_analytics_engine
+from backfill import Backfill
+from wallets import get_wallet_index
+from trades import get_trade_buffer
+
+# Importing this module has no side effects; bootstrap.py starts the poller
 logger = logging.getLogger(__name__)
 
-# Shared data dictionary to store fetched metrics
-shared_data = {}
-
-def fetch_and_store_token_data():
+# A watched token's snapshot (the configured token's by default) for alert and reply text when the caller
+# has none to hand
+def current_snapshot(token=None):
     try:
-        response = requests.get(TOKEN_URL)
-        response.raise_for_status()
-        data = response.json()
-        
-        shared_data['token_data'] = data
-        shared_data['token_name'] = data.get('baseToken', {}).get('name', 'N/A')
-        shared_data['token_symbol'] = data.get('baseToken', {}).get('symbol', 'N/A')
-        shared_data['market_cap'] = data.get('marketCap', 0.0)
-        shared_data['volume_24h'] = data.get('volume', {}).get('h24', {}).get('total', 0.0)
-        shared_data['volume_6h'] = data.get('volume', {}).get('h6', {}).get('total', 0.0)
-        shared_data['volume_1h'] = data.get('volume', {}).get('h1', {}).get('total', 0.0)
-        shared_data['volume_5m'] = data.get('volume', {}).get('m5', {}).get('total', 0.0)
-        shared_data['change_24h'] = data.get('priceChange', {}).get('h24', 0.0)
-        shared_data['change_6h'] = data.get('priceChange', {}).get('h6', 0.0)
-        shared_data['change_1h'] = data.get('priceChange', {}).get('h1', 0.0)
-        shared_data['change_5m'] = data.get('priceChange', {}).get('m5', 0.0)
-        shared_data['total_supply'] = data.get('totalSupply', '1B')
-        shared_data['current_price'] = data.get('priceUsd', 0.0)
-        shared_data['token_banner'] = data.get('profile', {}).get('banner', '')
-        shared_data['token_url'] = data.get('url', '')
-        shared_data['website_url'] = data.get('profile', {}).get('links', [''])[0]
-        logger.info("Token data fetched and stored successfully.")
+        if token is not None:
+            return get_token_snapshot(token.chain_id, token.address, max_age=Config.TOKEN_METADATA_TTL)
+        return get_token_snapshot(max_age=Config.TOKEN_METADATA_TTL)
     except Exception as e:
         logger.error(f"Error fetching token data: {e}")
+        return None
 
-def fetch_and_store_latest_trades():
-    try:
-        response = requests.get(TRADES_URL)
-        response.raise_for_status()
-        data = response.json()
-        logger.debug(f"Fetched trades data: {data}")  # Log the full response data
-        shared_data['latest_trades'] = data
-        logger.info("Latest trades fetched and stored successfully.")
-    except Exception as e:
-        logger.error(f"Error fetching latest trades: {e}")
-
-def get_latest_trades_for_token():
-    fetch_and_store_latest_trades()
-    return shared_data.get('latest_trades', [])
-
-# Function to check for new buy transactions
-last_transaction_timestamp = None
-
+# Alert every chat whose subscription matches each trade in a batch of ingested trades
+def notify_new_trades(token, trades):
+    snapshot = token.snapshot() or current_snapshot(token)
+    registry = get_subscription_registry()
+    for trade in trades:
+        chat_ids = registry.match(token.address, trade)
+        if not chat_ids:
+            continue
+        if trade.is_buy:
+            notify_new_buy(trade, token=token, snapshot=snapshot, chat_ids=chat_ids)
+            if Config.WHALE_ALERT_USD and trade.volume_usd >= Config.WHALE_ALERT_USD:
+                notify_whale_buy(trade, token=token, snapshot=snapshot, chat_ids=chat_ids)
+        else:
+            notify_new_sell(trade, token=token, snapshot=snapshot, chat_ids=chat_ids)
+
+# Keep the trade buffer, rolling whale leaderboards, candles and rolling analytics current
+def index_trades_in_memory(token, trades):
+    get_trade_buffer(token.address).extend(trades)
+    get_whale_index().add_trades(token.address, trades)
+    get_candle_engine().add_trades(token.address, trades)
+    get_analytics_engine().add_trades(token.address, trades)
+
+# ...and the wallet aggregates, which live in the store: only the ingesting process writes them
+def index_new_trades(token, trades):
+    index_trades_in_memory(token, trades)
+    get_wallet_index().add_trades(token.address, trades)
+
+# Load the watchlist and warm every token's indexes, alerting on new trades from then on. A process that
+# only follows another's ingest (notify=False) leaves the stored wallet aggregates to that process.
+def prepare_watch_engine(notify=True):
+    engine = get_watch_engine()
+    engine.add_listener(index_new_trades)
+    if notify:
+        engine.add_listener(notify_new_trades)
+    engine.load()
+    get_subscription_registry().seed(engine)
+    for token in list(engine.tokens.values()):
+        warm_indexes(token.address, wallets=notify)
+    return engine
+
+# Function to check for new buy transactions on every watched token
 def check_new_buy_transaction():
-    global last_transaction_timestamp
-    while True:
+    engine = prepare_watch_engine()
+    if Config.BACKFILL_ON_START:
+        for token in list(engine.tokens.values()):
+            start_backfill(token)
+    engine.run()
+
+# Load a token's indexes (trade buffer, whales, candles, analytics, wallets) from the local store
+def warm_indexes(token_address, wallets=True):
+    store = get_trade_store()
+    buffer = get_trade_buffer(token_address)
+    buffer.clear()
+    buffer.extend(reversed(store.latest_trades(token_address, limit=buffer.capacity)))
+    warm_whale_index(store, token_address)
+    get_candle_engine().rebuild(token_address, buffer)
+    get_analytics_engine().rebuild(token_address, buffer)
+    if wallets:
+        get_wallet_index().ensure(token_address)
+
+# Backfill a token's history in the background, then reload its indexes to include it
+def start_backfill(token):
+    def run():
         try:
-            logger.debug("Fetching and storing token data")
-            fetch_and_store_token_data()
-            
-            logger.debug("Fetching and storing latest trades")
-            fetch_and_store_latest_trades()
-            
-            latest_trades = shared_data.get('latest_trades', [])
-            buy_trades = [trade for trade in latest_trades if trade.get('type') == 'buy']
-            if not buy_trades:
-                logger.info("No new buy transactions found.")
-                continue
-
-            latest_trade = max(buy_trades, key=lambda trade: trade.get('blockTimestamp', 0))
-            if last_transaction_timestamp is None or latest_trade['blockTimestamp'] > last_transaction_timestamp:
-                notify_new_buy(latest_trade)
-                last_transaction_timestamp = latest_trade['blockTimestamp']
+            Backfill(token.chain_id, token.address).run()
+            get_wallet_index().rebuild(token.address)
+            warm_indexes(token.address)
         except Exception as e:
-            logger.error(f"Error in check_new_buy_transaction: {e}")
-        time.sleep(60)  # Check every 60 seconds
+            logger.error(f"Error backfilling {token.address}: {e}")
 
-def fetch_latest_trades():
-    try:
-        response = requests.get(TRADES_URL)
-        response.raise_for_status()
-        trades = response.json()
-        return trades
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching trades: {e}")
-        return []
-
-def notify_new_buy(trade):
+    threading.Thread(target=run, name=f'backfill-{token.address[:8]}', daemon=True).start()
+
+BUY_VIDEO_URL = 'https://cdn.glitch.global/ffa82557-90ab-436a-9585-9e6791f55285/582b8583-2440-4c96-aa3e-6de061b74b86.mp4?v=1721053375683'
+
+def notify_new_buy(trade, token=None, snapshot=None, chat_ids=None):
     logging.debug(f"Received trade data: {trade}")
 
-    # Ensure that token data has been fetched and stored
-    if 'token_name' not in shared_data or 'token_url' not in shared_data:
-        fetch_and_store_token_data()
+    if snapshot is None:
+        snapshot = current_snapshot(token)
 
-    # Extracting data from the trade dictionary
-    maker = trade.get('maker', 'N/A')
+    # Extracting data from the parsed trade
+    maker = trade.maker or 'N/A'
     truncated_maker = maker[:4] + "..." + maker[-4:]
-    amount0 = int(float(trade.get('amount0', '0')))  # Convert to integer to remove decimal places
-    amount1 = trade.get('amount1', 'N/A')
-    price_usd = trade.get('priceUsd', 'N/A')
-    volume_usd = trade.get('volumeUsd', 'N/A')
-    token_name = shared_data.get('token_name', 'N/A')  # From token data
-    token_url = shared_data.get('token_url', '')       # From token data
-    website_url = shared_data.get('website_url', '')   # From token data
-    dex_id = trade.get('dexId', 'N/A')
-    block_number = trade.get('blockNumber', 'N/A')
-    block_timestamp = trade.get('blockTimestamp', 'N/A')
-    pair_id = trade.get('pairId', 'N/A')
-    asset0_id = trade.get('asset0Id', 'N/A')
-    asset1_id = trade.get('asset1Id', 'N/A')
-    txn_id = trade.get('txnId', 'N/A')
-    progress = trade.get('metadata', {}).get('progress', 'N/A')
-    curve_position = trade.get('metadata', {}).get('curvePosition', 'N/A')
+    amount0 = int(trade.amount0)  # Convert to integer to remove decimal places
+    amount1 = trade.amount1
+    price_usd = trade.price_usd
+    volume_usd = trade.volume_usd
+    if snapshot is not None:
+        token_name = snapshot.token_name
+        token_symbol = snapshot.token_symbol
+        token_url = snapshot.token_url
+        website_url = snapshot.website_url
+        token_address = snapshot.address
+    else:
+        token_name = 'N/A'
+        token_url = ''
+        website_url = ''
+        token_address = token.address if token is not None else Config.TOKEN_ADDRESS
+        token_symbol = f"{token_address[:4]}...{token_address[-4:]}"
+    dex_id = trade.dex_id or 'N/A'
+    block_number = trade.block_number
+    block_timestamp = trade.block_timestamp
+    pair_id = trade.pair_id
+    asset0_id = trade.asset0_id
+    asset1_id = trade.asset1_id
+    txn_id = trade.txn_id
+    progress = trade.progress
+    curve_position = trade.curve_position
 
     # Log extracted values
     logging.debug(f"maker: {maker}")
@@ -140,6 +143,7 @@ def notify_new_buy(trade):
     logging.debug(f"price_usd: {price_usd}")
     logging.debug(f"volume_usd: {volume_usd}")
     logging.debug(f"token_name: {token_name}")
+    logging.debug(f"token_symbol: {token_symbol}")
     logging.debug(f"token_url: {token_url}")
     logging.debug(f"website_url: {website_url}")
     logging.debug(f"dex_id: {dex_id}")
@@ -152,30 +156,67 @@ def notify_new_buy(trade):
     logging.debug(f"progress: {progress}")
     logging.debug(f"curve_position: {curve_position}")
 
-    # Send video
-    bot.send_video(
-        chat_id=Config.TELEGRAM_CHAT_ID,
-        video='https://cdn.glitch.global/ffa82557-90ab-436a-9585-9e6791f55285/582b8583-2440-4c96-aa3e-6de061b74b86.mp4?v=1721053375683'
-    )
-
     message = (
-        f"\uD83D\uDC7E\uD83D\uDC7E\uD83D\uDC7E HEADROOM BUY! \uD83D\uDC7E\uD83D\uDC7E\uD83D\uDC7E\n"
-        f"\uD83D\uDCB5 Spent: ${volume_usd} \uD83D\uDCB0 Purchased: {amount0} {token_name}\n"
+        f"\uD83D\uDC7E\uD83D\uDC7E\uD83D\uDC7E {token_symbol} BUY! \uD83D\uDC7E\uD83D\uDC7E\uD83D\uDC7E\n"
+        f"\uD83D\uDCB5 Spent: ${volume_usd:,.2f} \uD83D\uDCB0 Purchased: {amount0} {token_name}\n"
         f"\uD83D\uDC64 Wallet: <a href='https://solanabeach.io/address/{maker}'>{truncated_maker}</a>\n"
         f"\uD83C\uDF19 <a href='{token_url}'>{dex_id}</a> \uD83D\uDD25 Progress: {progress}% \uD83C\uDF10 <a href='{website_url}')>Website</a>\n"
-        f"<a href='{token_url}'>{Config.TOKEN_ADDRESS}</a>"
+        f"<a href='{token_url}'>{token_address}</a>"
+    )
+
+    # Fan the alert out; the send queue handles rate limits and folds bursts into a digest
+    chat_ids = list(chat_ids or [Config.TELEGRAM_CHAT_ID])
+    logging.info(f"Broadcasting buy {txn_id} to {len(chat_ids)} chats: {message}")
+    get_broadcaster().send_buy(
+        txn_id,
+        chat_ids,
+        text=message,
+        video=BUY_VIDEO_URL,
+        volume_usd=volume_usd,
+        maker=maker,
+        token_name=token_name,
+        block_timestamp=block_timestamp,
     )
 
-    logging.info(f"Sending message: {message}")
-    bot.send_message(chat_id=Config.TELEGRAM_CHAT_ID, text=message, parse_mode=telegram.ParseMode.HTML, disable_web_page_preview=True)
+# Push a separate alert when a single buy crosses WHALE_ALERT_USD
+def notify_whale_buy(trade, token=None, snapshot=None, chat_ids=None):
+    maker = trade.maker
+    volume_usd = trade.volume_usd
+    snapshot = snapshot or current_snapshot(token)
+    token_name = snapshot.token_name if snapshot is not None else 'N/A'
+    message = (
+        f"🐳 WHALE ALERT! 🐳\n"
+        f"💵 ${volume_usd:,.2f} of {token_name} bought by "
+        f"<a href='https://solanabeach.io/address/{maker}'>{maker[:4]}...{maker[-4:]}</a>"
+    )
+    get_broadcaster().send_message(
+        f"whale:{trade.txn_id}", list(chat_ids or [Config.TELEGRAM_CHAT_ID]), message,
+        parse_mode=telegram.ParseMode.HTML, disable_web_page_preview=True,
+    )
 
+# Sell alerts, for chats that opted into them
+def notify_new_sell(trade, token=None, snapshot=None, chat_ids=None):
+    maker = trade.maker
+    snapshot = snapshot or current_snapshot(token)
+    token_name = snapshot.token_name if snapshot is not None else 'N/A'
+    message = (
+        f"🔻 {token_name} SELL 🔻\n"
+        f"💵 Received: ${trade.volume_usd:,.2f} 💰 Sold: {int(trade.amount0)} {token_name}\n"
+        f"👤 Wallet: <a href='https://solanabeach.io/address/{maker}'>{maker[:4]}...{maker[-4:]}</a>"
+    )
+    get_broadcaster().send_message(
+        trade.txn_id, list(chat_ids or [Config.TELEGRAM_CHAT_ID]), message,
+        parse_mode=telegram.ParseMode.HTML, disable_web_page_preview=True,
+    )
+
+# Run one ingestion pass for the configured token; only trades past the stored cursor are announced
 def main():
-    trades = fetch_latest_trades()
-    for trade in trades:
-        notify_new_buy(trade)
+    engine = get_watch_engine()
+    engine.add_listener(notify_new_trades)
+    token = engine.watch(Config.TOKEN_ADDRESS, chat_id=Config.TELEGRAM_CHAT_ID, persist=False)
+    get_subscription_registry().seed(engine)
+    token.poller.poll_once()
 
 if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.DEBUG)
     main()
-
-# Start the check_new_buy_transaction function in a new thread
-threading.Thread(target=check_new_buy_transaction, daemon=True).start()
@@ -1,30 +1,186 @@
-import requests
+import re
+import threading
+import time
+import transport
 import logging
 from config import Config
+from telemetry import cache_result
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def get_latest_news():
-    try:
-        # Using the /everything endpoint to fetch news related to Solana
-        url = f"https://newsapi.org/v2/everything?q=memecoin&apiKey={Config.NEWS_API_KEY}&pageSize=3"
-        logger.debug(f"Fetching news from URL: {url}")
-        response = requests.get(url)
+NEWS_URL = 'https://newsapi.org/v2/everything'
+
+
+def normalize_title(title):
+    return re.sub(r'[^a-z0-9]+', ' ', (title or '').lower()).strip()
+
+
+# Articles for one search query, newest first, deduplicated by URL and normalized title across refreshes
+class TopicFeed:
+    def __init__(self, query, max_articles):
+        self.query = query
+        self.max_articles = max_articles
+        self.articles = []
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = None
+        # Next time this feed may call NewsAPI, pushed back further after each consecutive failure
+        self.due_at = 0.0
+        self.failures = 0
+
+    def is_due(self, now=None):
+        return (now or time.time()) >= self.due_at
+
+    def succeeded(self, refresh_interval):
+        self.fetched_at = time.time()
+        self.failures = 0
+        self.due_at = self.fetched_at + refresh_interval
+
+    def failed(self):
+        self.failures += 1
+        backoff = Config.NEWS_RETRY_INTERVAL * 2 ** (self.failures - 1)
+        self.due_at = time.time() + min(backoff, Config.NEWS_RETRY_MAX_INTERVAL)
+
+    def merge(self, articles):
+        seen = {article['url'] for article in self.articles}
+        seen.update(normalize_title(article['title']) for article in self.articles)
+        added = []
+        for article in articles:
+            title = article.get('title')
+            url = article.get('url')
+            # NewsAPI keeps placeholders for articles taken down by the publisher
+            if not title or not url or title == '[Removed]':
+                continue
+            key = normalize_title(title)
+            if url in seen or key in seen:
+                continue
+            seen.update((url, key))
+            added.append({
+                'title': title,
+                'description': article.get('description') or '',
+                'url': url,
+                'published_at': article.get('publishedAt') or '',
+            })
+        if added:
+            self.articles = sorted(self.articles + added, key=lambda item: item['published_at'], reverse=True)
+            del self.articles[self.max_articles:]
+        return len(added)
+
+
+# News held in memory and refreshed in the background; readers never wait on NewsAPI once it has loaded
+class NewsService:
+    def __init__(self, topics=None, refresh_interval=None, max_articles=None):
+        self.refresh_interval = refresh_interval or Config.NEWS_REFRESH_INTERVAL
+        max_articles = max_articles or Config.NEWS_MAX_ARTICLES
+        self.feeds = {topic: TopicFeed(topic, max_articles) for topic in (topics or Config.NEWS_TOPICS)}
+        # Bumped whenever any feed gains articles, so rendered replies can be cached against it
+        self.version = 0
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='news-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            next_due = min(feed.due_at for feed in self.feeds.values())
+            self._stop.wait(max(1.0, next_due - time.time()))
+
+    def _fetch(self, feed):
+        # The key goes in a header so it never shows up in logged URLs
+        headers = {'X-Api-Key': Config.NEWS_API_KEY or ''}
+        if feed.etag:
+            headers['If-None-Match'] = feed.etag
+        if feed.last_modified:
+            headers['If-Modified-Since'] = feed.last_modified
+        params = {'q': feed.query, 'sortBy': 'publishedAt', 'pageSize': 20}
+        response = transport.get(NEWS_URL, params=params, headers=headers)
+        if response.status_code == 304:
+            logger.debug(f"News for '{feed.query}' not modified")
+            return 0
         response.raise_for_status()
-        news_data = response.json()
-        logger.debug(f"Received news data: {news_data}")
-        articles = news_data.get('articles', [])
-        if not articles:
-            logger.debug("No articles found in news data.")
-        news_items = [
-            {
-                'title': article['title'],
-                'description': article['description'],
-                'url': article['url']
-            } for article in articles
-        ]
-        return news_items
+        feed.etag = response.headers.get('ETag')
+        feed.last_modified = response.headers.get('Last-Modified')
+        return feed.merge(response.json().get('articles', []))
+
+    # Refresh the topics that are due; only one refresh runs at a time, and a caller that waited on one
+    # in flight finds its feeds no longer due and reuses its result
+    def refresh(self):
+        with self._refresh_lock:
+            self._refreshing = True
+            try:
+                for feed in self.feeds.values():
+                    if not feed.is_due():
+                        continue
+                    try:
+                        added = self._fetch(feed)
+                        feed.succeeded(self.refresh_interval)
+                        if added:
+                            self.version += 1
+                            logger.info(f"Fetched {added} new articles for '{feed.query}'")
+                    except Exception as e:
+                        # Keep serving what we have, and back off so a failing key or quota is not hammered
+                        feed.failed()
+                        logger.error(f"Error fetching news for '{feed.query}' (failure {feed.failures}): {e}")
+            finally:
+                self._refreshing = False
+
+    def _refresh_in_background(self):
+        if not self._refreshing:
+            threading.Thread(target=self.refresh, name='news-revalidate', daemon=True).start()
+
+    def latest(self, topic=None, limit=3):
+        feeds = [self.feeds[topic]] if topic else list(self.feeds.values())
+        now = time.time()
+        if all(feed.fetched_at is None for feed in feeds) and any(feed.is_due(now) for feed in feeds):
+            # Nothing loaded yet: wait for (or run) the first refresh
+            cache_result('news', False)
+            self.refresh()
+        elif any(feed.is_due(now) for feed in feeds):
+            # Stale-while-revalidate: answer from memory and refresh behind it
+            cache_result('news', False)
+            self._refresh_in_background()
+        else:
+            cache_result('news', True)
+
+        articles = []
+        seen = set()
+        for feed in feeds:
+            for article in feed.articles:
+                key = normalize_title(article['title'])
+                if article['url'] in seen or key in seen:
+                    continue
+                seen.update((article['url'], key))
+                articles.append(article)
+        articles.sort(key=lambda item: item['published_at'], reverse=True)
+        return articles[:limit]
+
+
+_news_service = None
+_news_service_lock = threading.Lock()
+
+
+def get_news_service():
+    global _news_service
+    if _news_service is None:
+        with _news_service_lock:
+            if _news_service is None:
+                _news_service = NewsService().start()
+    return _news_service
+
+
+def get_latest_news(topic=None, limit=3):
+    try:
+        return get_news_service().latest(topic, limit)
     except Exception as e:
         logger.error(f"Error fetching latest news: {e}")
         return []
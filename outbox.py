@@ -0,0 +1,300 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import telegram
+from telegram.error import BadRequest, ChatMigrated, NetworkError, RetryAfter, Unauthorized
+from telegram.utils.request import Request
+from config import Config
+from media import MEDIA_METHODS, get_media_cache
+from telemetry import ALERT_DELIVERY, SEND_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Most API calls one message makes (a buy alert's video plus its text); every bucket must hold this many
+MAX_CALLS = 2
+
+
+# Token bucket that reports how long until n tokens are available instead of blocking
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, n=1, now=None):
+        self._refill(now or time.monotonic())
+        if self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def consume(self, n=1):
+        self.tokens -= n
+
+
+# One pending send: a list of (method_name, kwargs) calls delivered in order
+class OutboundMessage:
+    def __init__(self, chat_id, calls, buy=None, block_timestamp=None, on_done=()):
+        self.chat_id = chat_id
+        self.calls = calls
+        self.buy = buy
+        # Block time of the trade this message reports, for delivery latency
+        self.block_timestamp = block_timestamp
+        # Called with True once delivered, or False once dropped
+        self.on_done = list(on_done)
+        self.attempts = 0
+        # Set once one of its calls has gone out; the rest must follow it rather than be folded into a digest
+        self.started = False
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def cost(self):
+        return len(self.calls)
+
+
+class ChatState:
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.pending = deque()
+        # Groups (negative ids) get 20 messages per minute, private chats about one per second
+        if str(chat_id).startswith('-'):
+            self.bucket = TokenBucket(Config.TELEGRAM_GROUP_RATE / 60.0, max(MAX_CALLS, Config.TELEGRAM_GROUP_BURST))
+        else:
+            self.bucket = TokenBucket(1.0, MAX_CALLS)
+        self.paused_until = 0.0
+        self.busy = False
+
+    # Nothing queued or in flight and the bucket full again, so dropping the state loses no rate limit
+    def idle(self, now):
+        return (not self.pending and not self.busy and self.paused_until <= now
+                and self.bucket.delay(self.bucket.capacity, now) == 0)
+
+
+def format_usd(value):
+    if value >= 1_000_000:
+        return f"${value / 1_000_000:.1f}M"
+    if value >= 1_000:
+        return f"${value / 1_000:.1f}k"
+    return f"${value:,.2f}"
+
+
+# Asynchronous outbound queue with global and per-chat rate limits and burst coalescing
+class SendQueue:
+    def __init__(self, bot=None, workers=None):
+        self.workers = workers or Config.SEND_WORKERS
+        # One pooled connection per worker so concurrent sends reuse keep-alive connections
+        self.bot = bot or telegram.Bot(
+            token=Config.TELEGRAM_TOKEN, base_url=Config.TELEGRAM_API_BASE,
+            request=Request(con_pool_size=self.workers + 1),
+        )
+        self.global_bucket = TokenBucket(Config.TELEGRAM_GLOBAL_RATE, max(MAX_CALLS, Config.TELEGRAM_GLOBAL_RATE))
+        self._chats = {}
+        self._order = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return self
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'send-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        SEND_QUEUE_DEPTH.set_function(self.depth)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def depth(self):
+        with self._cond:
+            return sum(len(state.pending) for state in self._chats.values())
+
+    def _enqueue(self, message, front=False):
+        with self._cond:
+            state = self._chats.get(message.chat_id)
+            if state is None:
+                state = self._chats[message.chat_id] = ChatState(message.chat_id)
+                self._order.append(message.chat_id)
+            if front:
+                state.pending.appendleft(message)
+            else:
+                state.pending.append(message)
+            self._cond.notify()
+
+    def send(self, chat_id, method, on_done=None, **kwargs):
+        self._enqueue(OutboundMessage(
+            chat_id, [(method, dict(kwargs, chat_id=chat_id))], on_done=[on_done] if on_done else (),
+        ))
+
+    def send_message(self, chat_id, text, on_done=None, **kwargs):
+        self.send(chat_id, 'send_message', on_done=on_done, text=text, **kwargs)
+
+    # A buy alert is an optional video followed by the HTML message; it may be folded into a digest
+    def send_buy(self, chat_id, text, video=None, volume_usd=0.0, maker='', token_name='', block_timestamp=None,
+                 on_done=None):
+        calls = []
+        if video:
+            calls.append(('send_video', {'chat_id': chat_id, 'video': video}))
+        calls.append(('send_message', {
+            'chat_id': chat_id, 'text': text,
+            'parse_mode': telegram.ParseMode.HTML, 'disable_web_page_preview': True,
+        }))
+        buy = {'volume_usd': volume_usd, 'maker': maker, 'token_name': token_name}
+        self._enqueue(OutboundMessage(
+            chat_id, calls, buy=buy, block_timestamp=block_timestamp, on_done=[on_done] if on_done else (),
+        ))
+
+    # Fold pending buy alerts into one digest per token; partly delivered alerts stay at the front
+    def _coalesce(self, state):
+        buys = [message for message in state.pending if message.buy is not None and not message.started]
+        if len(buys) < Config.SEND_COALESCE_THRESHOLD:
+            return
+        started = [message for message in state.pending if message.started]
+        state.pending = deque(
+            message for message in state.pending if message.buy is None and not message.started
+        )
+        by_token = {}
+        for message in buys:
+            by_token.setdefault(message.buy['token_name'], []).append(message)
+        for token_name, messages in by_token.items():
+            token_buys = [message.buy for message in messages]
+            largest = max(token_buys, key=lambda buy: buy['volume_usd'])
+            # The digest is as late as the oldest buy it covers
+            block_timestamps = [message.block_timestamp for message in messages if message.block_timestamp]
+            maker = largest['maker']
+            total = sum(buy['volume_usd'] for buy in token_buys)
+            text = (
+                f"👾 {len(token_buys)} {token_name} buys, {format_usd(total)} total, "
+                f"largest {maker[:4]}...{maker[-4:]} ({format_usd(largest['volume_usd'])})"
+            )
+            state.pending.appendleft(OutboundMessage(state.chat_id, [('send_message', {
+                'chat_id': state.chat_id, 'text': text, 'disable_web_page_preview': True,
+            })], block_timestamp=min(block_timestamps, default=None),
+                on_done=[callback for message in messages for callback in message.on_done]))
+        state.pending.extendleft(reversed(started))
+        logger.info(f"Coalesced {len(buys)} pending buy alerts for chat {state.chat_id}")
+
+    # Round-robin over chats, picking the first one whose limits allow its next message
+    def _next_message(self):
+        with self._cond:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                wait = 1.0
+                for _ in range(len(self._order)):
+                    chat_id = self._order[0]
+                    self._order.rotate(-1)
+                    state = self._chats[chat_id]
+                    if state.idle(now):
+                        # Rotated to the back above
+                        self._order.pop()
+                        del self._chats[chat_id]
+                        continue
+                    if state.busy or not state.pending:
+                        continue
+                    if state.paused_until > now:
+                        wait = min(wait, state.paused_until - now)
+                        continue
+                    self._coalesce(state)
+                    message = state.pending[0]
+                    delay = max(state.bucket.delay(message.cost, now), self.global_bucket.delay(message.cost, now))
+                    if delay > 0:
+                        wait = min(wait, delay)
+                        continue
+                    state.bucket.consume(message.cost)
+                    self.global_bucket.consume(message.cost)
+                    state.pending.popleft()
+                    state.busy = True
+                    return state, message
+                self._cond.wait(wait)
+        return None, None
+
+    def _deliver(self, message):
+        while message.calls:
+            method, kwargs = message.calls[0]
+            if method in MEDIA_METHODS:
+                get_media_cache().send(self.bot, method, **kwargs)
+            else:
+                getattr(self.bot, method)(**kwargs)
+            message.calls.pop(0)
+            message.started = True
+
+    def _worker(self):
+        while not self._stop.is_set():
+            state, message = self._next_message()
+            if message is None:
+                return
+            requeue = False
+            delivered = None
+            try:
+                self._deliver(message)
+                delivered = True
+                if message.block_timestamp:
+                    ALERT_DELIVERY.observe(
+                        time.time() - message.block_timestamp, kind='buy' if message.buy else 'digest'
+                    )
+                logger.debug(f"Delivered message to {message.chat_id} after {time.monotonic() - message.enqueued_at:.2f}s")
+            except RetryAfter as e:
+                logger.warning(f"Telegram asked to retry chat {message.chat_id} after {e.retry_after}s")
+                with self._cond:
+                    state.paused_until = time.monotonic() + float(e.retry_after)
+                requeue = True
+            except ChatMigrated as e:
+                logger.info(f"Chat {message.chat_id} migrated to {e.new_chat_id}")
+                for _, kwargs in message.calls:
+                    kwargs['chat_id'] = e.new_chat_id
+                message.chat_id = e.new_chat_id
+                self._enqueue(message, front=True)
+            except (BadRequest, Unauthorized) as e:
+                logger.error(f"Dropping message to {message.chat_id}: {e}")
+                delivered = False
+            except NetworkError as e:
+                message.attempts += 1
+                if message.attempts <= Config.SEND_MAX_RETRIES:
+                    logger.warning(f"Retrying message to {message.chat_id} ({message.attempts}): {e}")
+                    with self._cond:
+                        state.paused_until = time.monotonic() + min(30.0, 2 ** message.attempts)
+                    requeue = True
+                else:
+                    logger.error(f"Giving up on message to {message.chat_id}: {e}")
+                    delivered = False
+            except Exception as e:
+                logger.error(f"Error sending message to {message.chat_id}: {e}")
+                delivered = False
+            finally:
+                with self._cond:
+                    if requeue:
+                        state.pending.appendleft(message)
+                    state.busy = False
+                    self._cond.notify_all()
+            if delivered is not None:
+                self._done(message, delivered)
+
+    def _done(self, message, delivered):
+        for callback in message.on_done:
+            try:
+                callback(delivered)
+            except Exception as e:
+                logger.error(f"Error in delivery callback for {message.chat_id}: {e}")
+
+
+_send_queue = None
+_send_queue_lock = threading.Lock()
+
+
+def get_send_queue():
+    global _send_queue
+    if _send_queue is None:
+        with _send_queue_lock:
+            if _send_queue is None:
+                _send_queue = SendQueue().start()
+    return _send_queue
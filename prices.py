@@ -0,0 +1,242 @@
+import bisect
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+import transport
+from config import Config
+from telemetry import cache_result
+
+logger = logging.getLogger(__name__)
+
+SOL_MINT = 'So11111111111111111111111111111111111111112'
+
+# Quote assets looked up by CoinGecko coin id; any other asset id is treated as a Solana mint address
+COIN_IDS = {
+    SOL_MINT: 'solana',
+    'solana': 'solana',
+    'sol': 'solana',
+}
+
+
+def asset_key(asset_id):
+    return COIN_IDS.get(asset_id, asset_id)
+
+
+# CoinGecko coin ids are short lowercase slugs ('solana', 'usd-coin'); mint addresses are mixed-case base58
+def is_coin_id(key):
+    return key in COIN_IDS.values() or (key.islower() and len(key) < 32)
+
+
+class Quote(NamedTuple):
+    asset: str
+    usd: float
+    timestamp: float
+
+
+# Time-ordered USD price samples for one asset
+class PriceHistory:
+    def __init__(self, max_samples=None):
+        self.max_samples = max_samples or Config.PRICE_HISTORY_SIZE
+        self.timestamps = []
+        self.prices = []
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add(self, timestamp, price):
+        if self.timestamps and timestamp >= self.timestamps[-1]:
+            if timestamp == self.timestamps[-1]:
+                self.prices[-1] = price
+                return
+            self.timestamps.append(timestamp)
+            self.prices.append(price)
+        else:
+            i = bisect.bisect_left(self.timestamps, timestamp)
+            if i < len(self.timestamps) and self.timestamps[i] == timestamp:
+                self.prices[i] = price
+                return
+            self.timestamps.insert(i, timestamp)
+            self.prices.insert(i, price)
+        if len(self.timestamps) > self.max_samples:
+            del self.timestamps[0]
+            del self.prices[0]
+
+    def latest(self):
+        if not self.timestamps:
+            return None
+        return self.timestamps[-1], self.prices[-1]
+
+    # Nearest sample to timestamp, if one lies within max_age seconds of it
+    def at(self, timestamp, max_age):
+        i = bisect.bisect_left(self.timestamps, timestamp)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self.timestamps):
+                distance = abs(self.timestamps[j] - timestamp)
+                if distance <= max_age and (best is None or distance < best[0]):
+                    best = (distance, self.prices[j])
+        return best[1] if best else None
+
+
+# USD prices for quote assets (SOL first of all), refreshed in the background with every tracked
+# asset batched into as few lookups as possible. Trades are valued locally from amount1 × price.
+class PriceOracle:
+    def __init__(self, assets=None, refresh_interval=None, batch_size=None, max_age=None):
+        self.refresh_interval = refresh_interval or Config.PRICE_REFRESH_INTERVAL
+        self.batch_size = batch_size or Config.PRICE_BATCH_SIZE
+        self.max_age = max_age or Config.PRICE_MAX_AGE
+        self.assets = {asset_key(asset) for asset in (assets or Config.PRICE_ASSETS)}
+        self._history = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshed_at = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='price-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_interval)
+
+    # Include an asset in background refreshes; returns its lookup key
+    def track(self, asset_id):
+        key = asset_key(asset_id)
+        if key and key not in self.assets:
+            with self._lock:
+                self.assets.add(key)
+            logger.info(f"Tracking USD price of {key}")
+        return key
+
+    def history(self, key):
+        history = self._history.get(key)
+        if history is None:
+            with self._lock:
+                history = self._history.setdefault(key, PriceHistory())
+        return history
+
+    def record(self, key, timestamp, price):
+        if price and price > 0:
+            history = self.history(key)
+            with self._lock:
+                history.add(timestamp, float(price))
+
+    def _lookup(self, path, params, keys):
+        url = f"{Config.PRICE_API_BASE}{path}"
+        params = dict(params, vs_currencies='usd', include_last_updated_at='true')
+        response = transport.get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        now = time.time()
+        found = 0
+        for key in keys:
+            entry = data.get(key) or data.get(key.lower()) or {}
+            if 'usd' in entry:
+                self.record(key, entry.get('last_updated_at') or now, entry['usd'])
+                found += 1
+        return found
+
+    # One request per batch of coin ids and one per batch of mint addresses
+    def refresh(self):
+        with self._refresh_lock:
+            with self._lock:
+                keys = sorted(self.assets)
+            coins = [key for key in keys if is_coin_id(key)]
+            mints = [key for key in keys if not is_coin_id(key)]
+            for i in range(0, len(coins), self.batch_size):
+                batch = coins[i:i + self.batch_size]
+                try:
+                    self._lookup('/simple/price', {'ids': ','.join(batch)}, batch)
+                except Exception as e:
+                    logger.error(f"Error refreshing prices for {len(batch)} coins: {e}")
+            for i in range(0, len(mints), self.batch_size):
+                batch = mints[i:i + self.batch_size]
+                try:
+                    self._lookup('/simple/token_price/solana', {'contract_addresses': ','.join(batch)}, batch)
+                except Exception as e:
+                    logger.error(f"Error refreshing prices for {len(batch)} mints: {e}")
+            self.refreshed_at = time.time()
+
+    # Latest known price; only the very first lookup waits on the upstream
+    def quote(self, asset_id='solana'):
+        key = self.track(asset_id)
+        latest = self.history(key).latest()
+        cache_result('price', latest is not None)
+        if latest is None and self.refreshed_at is None:
+            self.refresh()
+            latest = self.history(key).latest()
+        if latest is None:
+            return None
+        return Quote(key, latest[1], latest[0])
+
+    def price_at(self, asset_id, timestamp, max_age=None):
+        history = self._history.get(asset_key(asset_id))
+        if history is None:
+            return None
+        with self._lock:
+            return history.at(timestamp, max_age or self.max_age)
+
+    # Fill in past prices (e.g. before a backfill) from CoinGecko's market chart
+    def load_history(self, asset_id, start, end):
+        key = self.track(asset_id)
+        if is_coin_id(key):
+            path = f"/coins/{key}/market_chart/range"
+        else:
+            path = f"/coins/solana/contract/{key}/market_chart/range"
+        response = transport.get(
+            f"{Config.PRICE_API_BASE}{path}",
+            params={'vs_currency': 'usd', 'from': int(start), 'to': int(end)},
+        )
+        response.raise_for_status()
+        points = response.json().get('prices', [])
+        for timestamp_ms, price in points:
+            self.record(key, timestamp_ms / 1000.0, price)
+        logger.info(f"Loaded {len(points)} historical prices for {key}")
+        return len(points)
+
+    # Set a trade's USD price and volume from amount1 × the quote asset's price at the trade's time.
+    # Trades without a nearby price keep the upstream values.
+    def value(self, trade, max_age=None):
+        usd = self.price_at(trade.asset1_id, trade.block_timestamp, max_age)
+        if usd is None:
+            return False
+        trade.volume_usd = trade.amount1 * usd
+        trade.price_usd = trade.price_native * usd
+        return True
+
+    def value_trades(self, trades, max_age=None):
+        for asset_id in {trade.asset1_id for trade in trades if trade.asset1_id}:
+            self.track(asset_id)
+        for trade in trades:
+            self.value(trade, max_age)
+        return trades
+
+
+_price_oracle = None
+_price_oracle_lock = threading.Lock()
+
+
+def get_price_oracle():
+    global _price_oracle
+    if _price_oracle is None:
+        with _price_oracle_lock:
+            if _price_oracle is None:
+                _price_oracle = PriceOracle().start()
+    return _price_oracle
+
+
+# Local USD valuation at ingest, unless USD_VALUATION is set to 'upstream'
+def value_trades(trades, max_age=None):
+    if Config.USD_VALUATION != 'local':
+        return trades
+    return get_price_oracle().value_trades(trades, max_age)
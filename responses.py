@@ -0,0 +1,65 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from config import Config
+from telemetry import cache_result
+
+logger = logging.getLogger(__name__)
+
+
+# Rendered chat replies keyed by command (and arguments), reused while the data version behind them is unchanged.
+# Concurrent requests for the same key and version share a single render.
+class ResponseCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or Config.RESPONSE_CACHE_SIZE
+        # key -> (version, rendered value)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, render):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    cache_result('response', True)
+                    return entry[1]
+                inflight = self._inflight.get((key, version))
+                if inflight is None:
+                    inflight = self._inflight[(key, version)] = threading.Event()
+                    break
+            # Someone else is rendering this version; use their result, or take over if they failed
+            inflight.wait()
+
+        cache_result('response', False)
+        try:
+            value = render()
+            with self._lock:
+                self._entries[key] = (version, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop((key, version), None)
+            inflight.set()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# Token bucket shared by every poller: at most `per_minute` upstream requests per minute
+class RequestBudget:
+    def __init__(self, per_minute=None):
+        self.per_minute = per_minute or Config.POLL_REQUEST_BUDGET
+        self.capacity = float(self.per_minute)
+        self.tokens = self.capacity
+        self.rate = self.per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, n=1):
+        with self._lock:
+            self._refill()
+            if self.tokens >= n:
+                self.tokens -= n
+                return True
+            return False
+
+    # Blocks until n requests fit in the budget; returns the time spent waiting
+    def acquire(self, n=1):
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                delay = (n - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+_budget = None
+_executor = None
+_shared_lock = threading.Lock()
+
+
+def get_request_budget():
+    global _budget
+    if _budget is None:
+        with _shared_lock:
+            if _budget is None:
+                _budget = RequestBudget()
+    return _budget
+
+
+def get_poll_executor():
+    global _executor
+    if _executor is None:
+        with _shared_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.POLL_WORKERS, thread_name_prefix='poll')
+    return _executor
+
+
+# Polls token and trade endpoints concurrently, speeding up while trades flow and backing off when idle
+class AdaptivePoller:
+    def __init__(self, token_cache, fetch_trades, ingestor, on_trades, fetch_token=None, budget=None,
+                 executor=None, min_interval=None, max_interval=None):
+        self.token_cache = token_cache
+        self.fetch_token = fetch_token or token_cache.get
+        self.fetch_trades = fetch_trades
+        self.ingestor = ingestor
+        self.on_trades = on_trades
+        self.budget = budget or get_request_budget()
+        self.executor = executor or get_poll_executor()
+        self.min_interval = min_interval or Config.POLL_MIN_INTERVAL
+        self.max_interval = max_interval or Config.POLL_MAX_INTERVAL
+        self.interval = self.min_interval
+        self._last_volume_5m = None
+        self._last_snapshot_version = None
+
+    # Trades already drive the rolling analytics, so the token itself is only refreshed for metadata
+    def _token_is_stale(self):
+        snapshot = self.token_cache.peek()
+        return snapshot is None or snapshot.age() >= max(self.token_cache.ttl, Config.TOKEN_METADATA_TTL)
+
+    # Upstream requests the next poll will make: trades always, the token only when stale
+    def requests_needed(self):
+        return 2 if self._token_is_stale() else 1
+
+    def poll_once(self, acquire=True):
+        requests_needed = self.requests_needed()
+        if acquire:
+            self.budget.acquire(requests_needed)
+
+        token_future = self.executor.submit(self.fetch_token) if requests_needed == 2 else None
+        trades_future = self.executor.submit(self.fetch_trades)
+
+        trades = trades_future.result() or []
+        try:
+            new_trades = self.ingestor.ingest(trades)
+        finally:
+            # Streams stop reading the page once the ingestor reaches known trades
+            close = getattr(trades, 'close', None)
+            if close is not None:
+                close()
+        snapshot = self._resolve_token(token_future)
+        if new_trades:
+            self.on_trades(new_trades)
+
+        self.interval = self._next_interval(len(new_trades), snapshot)
+        return self.interval
+
+    # The trades are already ingested by now, so a failed token refresh must not stop them being announced
+    def _resolve_token(self, token_future):
+        if token_future is not None:
+            try:
+                return token_future.result()
+            except Exception as e:
+                logger.warning(f"Token refresh for {self.token_cache.address} failed, keeping last snapshot: {e}")
+        return self.token_cache.peek()
+
+    def _next_interval(self, new_trade_count, snapshot):
+        volume_rising = False
+        if snapshot is not None and snapshot.version != self._last_snapshot_version:
+            if self._last_volume_5m is not None:
+                volume_rising = snapshot.volume_5m > self._last_volume_5m
+            self._last_volume_5m = snapshot.volume_5m
+            self._last_snapshot_version = snapshot.version
+
+        if new_trade_count or volume_rising:
+            interval = self.interval * Config.POLL_SPEEDUP_FACTOR
+        else:
+            interval = self.interval * Config.POLL_BACKOFF_FACTOR
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def run(self, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling {self.token_cache.address}: {e}")
+                self.interval = min(self.max_interval, self.interval * Config.POLL_BACKOFF_FACTOR)
+            logger.debug(f"Next poll for {self.token_cache.address} in {self.interval:.1f}s")
+            stop_event.wait(self.interval)
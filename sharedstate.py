@@ -0,0 +1,214 @@
+import json
+import logging
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from config import Config
+from ingest import TradeIngestor, TradeCursor
+from store import get_trade_store
+
+logger = logging.getLogger(__name__)
+
+# Sequence number (odd while a write is in progress) and payload length
+HEADER = struct.Struct('<QI')
+
+
+# One named shared-memory segment holding the latest JSON state, written by a single process and read
+# by any number of others under a seqlock: readers never block the writer and retry torn reads.
+# The segment outlives its processes, so a restarted writer carries on where the last one stopped.
+class SharedState:
+    def __init__(self, name=None, size=None, create=False):
+        self.name = name or Config.SHARED_STATE_NAME
+        size = size or Config.SHARED_STATE_SIZE
+        if create:
+            try:
+                self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+            except FileExistsError:
+                self._shm = shared_memory.SharedMemory(name=self.name)
+        else:
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        # Otherwise the resource tracker unlinks the segment when this process exits
+        resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self.capacity = self._shm.size - HEADER.size
+        self._sequence = HEADER.unpack_from(self._shm.buf, 0)[0] & ~1
+
+    def close(self):
+        self._shm.close()
+
+    def write(self, payload):
+        if len(payload) > self.capacity:
+            raise ValueError(f"Shared state of {len(payload)} bytes exceeds {self.capacity}; raise SHARED_STATE_SIZE")
+        buf = self._shm.buf
+        HEADER.pack_into(buf, 0, self._sequence + 1, 0)
+        buf[HEADER.size:HEADER.size + len(payload)] = payload
+        self._sequence += 2
+        HEADER.pack_into(buf, 0, self._sequence, len(payload))
+
+    # (sequence, payload) once a consistent copy is read, or None if nothing newer than `since` was written
+    def read(self, since=None, retries=100):
+        buf = self._shm.buf
+        for _ in range(retries):
+            sequence, length = HEADER.unpack_from(buf, 0)
+            if sequence == since or sequence == 0:
+                return None
+            if sequence & 1:
+                time.sleep(0.0005)
+                continue
+            payload = bytes(buf[HEADER.size:HEADER.size + length])
+            if HEADER.unpack_from(buf, 0)[0] == sequence:
+                return sequence, payload
+        return None
+
+
+# Poller side: publishes every watched token's latest snapshot and trade cursor, re-encoding only
+# snapshots that changed since the last write
+class StatePublisher:
+    def __init__(self, engine, state=None, interval=None):
+        self.engine = engine
+        self.state = state or SharedState(create=True)
+        self.interval = interval or Config.SHARED_STATE_INTERVAL
+        self._encoded = {}
+        self._published = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._on_tick = []
+
+    # Run alongside each publish, e.g. to pick up watchlist changes saved by the command process
+    def add_tick(self, callback):
+        self._on_tick.append(callback)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='state-publisher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for callback in self._on_tick:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Error in shared state tick: {e}")
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Error publishing shared state: {e}")
+
+    def _encode_snapshot(self, snapshot):
+        key = (snapshot.chain_id, snapshot.address)
+        cached = self._encoded.get(key)
+        if cached is None or cached[0] != snapshot.version:
+            cached = self._encoded[key] = (snapshot.version, json.dumps(
+                {'data': dict(snapshot.raw), 'fetched_at': snapshot.fetched_at}, separators=(',', ':'),
+            ))
+        return cached[1]
+
+    def publish(self):
+        tokens = list(self.engine.tokens.values())
+        signature = tuple(
+            (token.key, token.ingestor.cursor, getattr(token.snapshot(), 'version', None)) for token in tokens
+        )
+        if signature == self._published:
+            return False
+        entries = []
+        for token in tokens:
+            snapshot = token.snapshot()
+            entries.append('{"chain":%s,"address":%s,"cursor":%s,"snapshot":%s}' % (
+                json.dumps(token.chain_id), json.dumps(token.address),
+                json.dumps(list(token.ingestor.cursor) if token.ingestor.cursor else None),
+                self._encode_snapshot(snapshot) if snapshot is not None else 'null',
+            ))
+        live = {token.key for token in tokens}
+        for key in [key for key in self._encoded if key not in live]:
+            del self._encoded[key]
+        payload = '{"published_at":%r,"tokens":[%s]}' % (time.time(), ','.join(entries))
+        self.state.write(payload.encode())
+        self._published = signature
+        return True
+
+
+# Command side: installs the poller's snapshots in the local token caches and, when a token's cursor
+# moves, reads the new trades from the shared store and hands them to on_trades(token, trades)
+class StateFollower:
+    def __init__(self, engine, on_trades, store=None, interval=None):
+        self.engine = engine
+        self.on_trades = on_trades
+        self.store = store or get_trade_store()
+        self.interval = interval or Config.SHARED_STATE_INTERVAL
+        self.state = None
+        self.sequence = None
+        self._ingestors = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='state-follower', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.follow()
+            except Exception as e:
+                logger.error(f"Error following shared state: {e}")
+
+    def _attach(self):
+        try:
+            self.state = SharedState()
+            logger.info(f"Following shared state '{self.state.name}'")
+        except FileNotFoundError:
+            # The poller has not started yet; the command process answers from upstream until it does
+            return False
+        return True
+
+    # Trades the local indexes have not seen, replayed newest first through an ingestor of their own
+    def _ingestor(self, token):
+        ingestor = self._ingestors.get(token.key)
+        if ingestor is None:
+            # Start at what warm_indexes already loaded, backfilled trades included
+            cursor = self.store.load_cursor(token.chain_id, token.address)
+            latest = self.store.latest_trades(token.address, limit=1)
+            if latest and (cursor is None or latest[0].position > cursor[:2]):
+                cursor = TradeCursor(latest[0].block_number, latest[0].block_timestamp, latest[0].txn_id)
+            ingestor = self._ingestors[token.key] = TradeIngestor(
+                cursor=cursor,
+                seen_txn_ids=self.store.recent_txn_ids(token.address, Config.INGEST_SEEN_SIZE),
+                announce_backlog=True,
+            )
+        return ingestor
+
+    def follow(self):
+        if self.state is None and not self._attach():
+            return False
+        read = self.state.read(since=self.sequence)
+        if read is None:
+            return False
+        self.sequence, payload = read
+        for entry in json.loads(payload)['tokens']:
+            token = self.engine.get(entry['address'], entry['chain'])
+            if token is None:
+                continue
+            if entry['snapshot'] is not None:
+                token.cache.install(entry['snapshot']['data'], entry['snapshot']['fetched_at'])
+            if entry['cursor'] is None:
+                continue
+            cursor = TradeCursor(*entry['cursor'])
+            ingestor = self._ingestor(token)
+            if ingestor.cursor is not None and cursor[:2] <= ingestor.cursor[:2]:
+                continue
+            since = ingestor.cursor.block_number if ingestor.cursor else 0
+            trades = ingestor.ingest(self.store.trades_from_block(token.address, since))
+            if trades:
+                self.on_trades(token, trades)
+        return True
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+import transport
+from config import Config
+from telemetry import cache_result
+
+logger = logging.getLogger(__name__)
+
+
+# Immutable view of one /token/v1 response, parsed once per refresh
+@dataclass(frozen=True)
+class TokenSnapshot:
+    chain_id: str
+    address: str
+    token_name: str
+    token_symbol: str
+    market_cap: float
+    volume_24h: float
+    volume_6h: float
+    volume_1h: float
+    volume_5m: float
+    change_24h: float
+    change_6h: float
+    change_1h: float
+    change_5m: float
+    total_supply: Any
+    current_price: float
+    liquidity: float
+    token_creator: str
+    token_banner: str
+    token_url: str
+    website_url: str
+    raw: Mapping[str, Any]
+    fetched_at: float
+    version: int
+
+    @classmethod
+    def from_json(cls, chain_id, address, data, version, fetched_at=None):
+        volume = data.get('volume', {})
+        change = data.get('priceChange', {})
+        profile = data.get('profile', {})
+        links = profile.get('links') or ['']
+        return cls(
+            chain_id=chain_id,
+            address=address,
+            token_name=data.get('baseToken', {}).get('name', 'N/A'),
+            token_symbol=data.get('baseToken', {}).get('symbol', 'N/A'),
+            market_cap=_to_float(data.get('marketCap', 0.0)),
+            volume_24h=_to_float(volume.get('h24', {}).get('total', 0.0)),
+            volume_6h=_to_float(volume.get('h6', {}).get('total', 0.0)),
+            volume_1h=_to_float(volume.get('h1', {}).get('total', 0.0)),
+            volume_5m=_to_float(volume.get('m5', {}).get('total', 0.0)),
+            change_24h=_to_float(change.get('h24', 0.0)),
+            change_6h=_to_float(change.get('h6', 0.0)),
+            change_1h=_to_float(change.get('h1', 0.0)),
+            change_5m=_to_float(change.get('m5', 0.0)),
+            total_supply=data.get('totalSupply', 'N/A'),
+            current_price=_to_float(data.get('priceUsd', 0.0)),
+            liquidity=_to_float(data.get('liquidity', {}).get('h24', {}).get('total', 0.0)),
+            token_creator=data.get('moonshot', {}).get('creator', ''),
+            token_banner=profile.get('banner', ''),
+            token_url=data.get('url', ''),
+            website_url=links[0] if isinstance(links[0], str) else links[0].get('url', ''),
+            raw=MappingProxyType(data),
+            fetched_at=fetched_at if fetched_at is not None else time.time(),
+            version=version,
+        )
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# TTL cache with single-flight refresh: concurrent callers share one upstream request
+class TokenCache:
+    def __init__(self, chain_id, address, ttl=None):
+        self.chain_id = chain_id
+        self.address = address
+        self.ttl = Config.TOKEN_CACHE_TTL if ttl is None else ttl
+        self._snapshot: Optional[TokenSnapshot] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._inflight: Optional[threading.Event] = None
+        self._error: Optional[Exception] = None
+
+    @property
+    def url(self):
+        return f"{Config.BASE_URL}/token/v1/{self.chain_id}/{self.address}"
+
+    def peek(self):
+        return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    # Adopt a response fetched by another process, unless ours is at least as fresh
+    def install(self, data, fetched_at):
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.fetched_at >= fetched_at:
+                return False
+            self._version += 1
+            self._snapshot = TokenSnapshot.from_json(self.chain_id, self.address, data, self._version, fetched_at)
+        return True
+
+    def get(self, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age() < max_age:
+            cache_result('token', True)
+            return snapshot
+        cache_result('token', False)
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.age() < max_age:
+                return snapshot
+            inflight = self._inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight = threading.Event()
+
+        if not leader:
+            inflight.wait()
+            if self._snapshot is None:
+                raise self._error or RuntimeError("Token snapshot unavailable")
+            return self._snapshot
+
+        try:
+            self._refresh()
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+        return self._snapshot
+
+    def _refresh(self):
+        try:
+            response = transport.get(self.url)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            self._error = e
+            logger.error(f"Error refreshing token snapshot for {self.address}: {e}")
+            if self._snapshot is None:
+                raise
+            # Serve the stale snapshot rather than failing every caller
+            return
+        self._version += 1
+        self._error = None
+        self._snapshot = TokenSnapshot.from_json(self.chain_id, self.address, data, self._version)
+        logger.debug(f"Token snapshot v{self._version} refreshed for {self.address}")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# Process-wide cache per (chain, address)
+def get_token_cache(chain_id=None, address=None):
+    key = (chain_id or Config.CHAIN_ID, address or Config.TOKEN_ADDRESS)
+    cache = _caches.get(key)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(key)
+            if cache is None:
+                cache = _caches[key] = TokenCache(*key)
+    return cache
+
+
+def get_token_snapshot(chain_id=None, address=None, max_age=None):
+    return get_token_cache(chain_id, address).get(max_age)
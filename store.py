@@ -0,0 +1,339 @@
+import logging
+import sqlite3
+import threading
+
+from config import Config
+from ingest import TradeCursor
+from trades import Trade
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    txn_id TEXT PRIMARY KEY,
+    chain_id TEXT NOT NULL,
+    token_address TEXT NOT NULL,
+    dex_id TEXT,
+    pair_id TEXT,
+    asset0_id TEXT,
+    asset1_id TEXT,
+    block_number INTEGER NOT NULL,
+    block_timestamp INTEGER NOT NULL,
+    maker TEXT,
+    type TEXT,
+    amount0 REAL,
+    amount1 REAL,
+    price_native REAL,
+    price_usd REAL,
+    volume_usd REAL,
+    progress REAL,
+    curve_position TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_token_time ON trades (token_address, block_timestamp);
+CREATE INDEX IF NOT EXISTS trades_token_maker ON trades (token_address, maker);
+CREATE INDEX IF NOT EXISTS trades_token_volume ON trades (token_address, volume_usd);
+CREATE TABLE IF NOT EXISTS cursors (
+    chain_id TEXT NOT NULL,
+    token_address TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    block_timestamp INTEGER NOT NULL,
+    txn_id TEXT NOT NULL,
+    PRIMARY KEY (chain_id, token_address)
+);
+CREATE TABLE IF NOT EXISTS backfill_slices (
+    chain_id TEXT NOT NULL,
+    token_address TEXT NOT NULL,
+    start_timestamp INTEGER NOT NULL,
+    end_timestamp INTEGER NOT NULL,
+    trades INTEGER NOT NULL,
+    PRIMARY KEY (chain_id, token_address, start_timestamp, end_timestamp)
+);
+CREATE TABLE IF NOT EXISTS wallets (
+    token_address TEXT NOT NULL,
+    maker TEXT NOT NULL,
+    bought REAL NOT NULL DEFAULT 0,
+    sold REAL NOT NULL DEFAULT 0,
+    net REAL NOT NULL DEFAULT 0,
+    sol_spent REAL NOT NULL DEFAULT 0,
+    sol_received REAL NOT NULL DEFAULT 0,
+    volume_usd REAL NOT NULL DEFAULT 0,
+    buys INTEGER NOT NULL DEFAULT 0,
+    sells INTEGER NOT NULL DEFAULT 0,
+    first_seen INTEGER,
+    last_seen INTEGER,
+    PRIMARY KEY (token_address, maker)
+);
+CREATE INDEX IF NOT EXISTS wallets_token_net ON wallets (token_address, net);
+CREATE INDEX IF NOT EXISTS wallets_token_bought ON wallets (token_address, bought);
+CREATE INDEX IF NOT EXISTS wallets_token_volume ON wallets (token_address, volume_usd);
+"""
+
+WALLET_COLUMNS = (
+    'token_address', 'maker', 'bought', 'sold', 'net', 'sol_spent', 'sol_received', 'volume_usd',
+    'buys', 'sells', 'first_seen', 'last_seen',
+)
+
+# Leaderboard orderings, each backed by an index
+WALLET_ORDERS = {
+    'holders': 'net',
+    'buyers': 'bought',
+    'volume': 'volume_usd',
+}
+
+TRADE_COLUMNS = (
+    'txn_id', 'chain_id', 'token_address', 'dex_id', 'pair_id', 'asset0_id', 'asset1_id',
+    'block_number', 'block_timestamp', 'maker', 'type', 'amount0', 'amount1',
+    'price_native', 'price_usd', 'volume_usd', 'progress', 'curve_position',
+)
+
+
+def trade_to_row(chain_id, token_address, trade):
+    return (
+        trade.txn_id, chain_id, token_address, trade.dex_id, trade.pair_id, trade.asset0_id, trade.asset1_id,
+        trade.block_number, trade.block_timestamp, trade.maker, trade.type,
+        trade.amount0, trade.amount1, trade.price_native, trade.price_usd, trade.volume_usd,
+        trade.progress, str(trade.curve_position),
+    )
+
+
+def row_to_trade(row):
+    return Trade(
+        txn_id=row['txn_id'],
+        dex_id=row['dex_id'] or '',
+        pair_id=row['pair_id'] or '',
+        asset0_id=row['asset0_id'] or '',
+        asset1_id=row['asset1_id'] or '',
+        block_number=row['block_number'],
+        block_timestamp=row['block_timestamp'],
+        maker=row['maker'] or '',
+        type=row['type'] or '',
+        amount0=row['amount0'] or 0.0,
+        amount1=row['amount1'] or 0.0,
+        price_native=row['price_native'] or 0.0,
+        price_usd=row['price_usd'] or 0.0,
+        volume_usd=row['volume_usd'] or 0.0,
+        progress=row['progress'] or 0.0,
+        curve_position=int(row['curve_position'] or 0),
+    )
+
+
+# Embedded SQLite (WAL) store for normalized trades and ingestion cursors
+class TradeStore:
+    def __init__(self, path=None):
+        self.path = path or Config.TRADE_DB_PATH
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            conn = self._conn()
+            conn.executescript(SCHEMA)
+            conn.commit()
+
+    # One connection per thread; WAL lets readers run alongside the single writer
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # INSERT OR IGNORE on txn_id, so trades seen twice are stored once; returns rows inserted
+    def _insert_trades(self, conn, chain_id, token_address, trades):
+        rows = [trade_to_row(chain_id, token_address, trade) for trade in trades if trade.txn_id]
+        placeholders = ', '.join('?' for _ in TRADE_COLUMNS)
+        before = conn.total_changes
+        conn.executemany(
+            f"INSERT OR IGNORE INTO trades ({', '.join(TRADE_COLUMNS)}) VALUES ({placeholders})", rows
+        )
+        return conn.total_changes - before
+
+    # Write a batch of trades and the cursor that covers them in one transaction
+    def record(self, chain_id, token_address, trades, cursor=None):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                inserted = self._insert_trades(conn, chain_id, token_address, trades)
+                if cursor is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?, ?)",
+                        (chain_id, token_address, cursor.block_number, cursor.block_timestamp, cursor.txn_id),
+                    )
+        logger.debug(f"Stored {inserted} trades for {token_address}")
+
+    # Backfilled trades and the time slices they complete, in one transaction; returns trades inserted
+    # (txnIds already written by live ingestion are skipped)
+    def record_backfill(self, chain_id, token_address, trades, slices):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                inserted = self._insert_trades(conn, chain_id, token_address, trades)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO backfill_slices VALUES (?, ?, ?, ?, ?)",
+                    [(chain_id, token_address, start, end, count) for start, end, count in slices],
+                )
+        return inserted
+
+    def backfill_slices(self, chain_id, token_address):
+        rows = self._conn().execute(
+            "SELECT start_timestamp, end_timestamp FROM backfill_slices WHERE chain_id = ? AND token_address = ? "
+            "ORDER BY start_timestamp",
+            (chain_id, token_address),
+        )
+        return [(row[0], row[1]) for row in rows]
+
+    def load_cursor(self, chain_id, token_address):
+        row = self._conn().execute(
+            "SELECT block_number, block_timestamp, txn_id FROM cursors WHERE chain_id = ? AND token_address = ?",
+            (chain_id, token_address),
+        ).fetchone()
+        return TradeCursor(row['block_number'], row['block_timestamp'], row['txn_id']) if row else None
+
+    def recent_txn_ids(self, token_address, limit):
+        rows = self._conn().execute(
+            "SELECT txn_id FROM trades WHERE token_address = ? ORDER BY block_timestamp DESC LIMIT ?",
+            (token_address, limit),
+        ).fetchall()
+        return [row['txn_id'] for row in reversed(rows)]
+
+    def latest_trades(self, token_address, limit=50, trade_type=None):
+        query = "SELECT * FROM trades WHERE token_address = ?"
+        params = [token_address]
+        if trade_type:
+            query += " AND type = ?"
+            params.append(trade_type)
+        query += " ORDER BY block_timestamp DESC, block_number DESC LIMIT ?"
+        params.append(limit)
+        return [row_to_trade(row) for row in self._conn().execute(query, params)]
+
+    def trades_since(self, token_address, since_timestamp):
+        rows = self._conn().execute(
+            "SELECT * FROM trades WHERE token_address = ? AND block_timestamp >= ? ORDER BY block_timestamp",
+            (token_address, since_timestamp),
+        )
+        return [row_to_trade(row) for row in rows]
+
+    # Newest first, like a /trades/v1/latest page, so another process's ingestor can replay them
+    def trades_from_block(self, token_address, block_number):
+        rows = self._conn().execute(
+            "SELECT * FROM trades WHERE token_address = ? AND block_number >= ? "
+            "ORDER BY block_number DESC, block_timestamp DESC",
+            (token_address, block_number),
+        )
+        return [row_to_trade(row) for row in rows]
+
+    def trades_by_maker(self, token_address, maker, limit=50):
+        rows = self._conn().execute(
+            "SELECT * FROM trades WHERE token_address = ? AND maker = ? ORDER BY block_timestamp DESC LIMIT ?",
+            (token_address, maker, limit),
+        )
+        return [row_to_trade(row) for row in rows]
+
+    def largest_trades(self, token_address, since_timestamp=0, until_timestamp=None, limit=10, trade_type=None):
+        query = "SELECT * FROM trades WHERE token_address = ? AND block_timestamp >= ?"
+        params = [token_address, since_timestamp]
+        if until_timestamp is not None:
+            query += " AND block_timestamp < ?"
+            params.append(until_timestamp)
+        if trade_type:
+            query += " AND type = ?"
+            params.append(trade_type)
+        query += " ORDER BY volume_usd DESC LIMIT ?"
+        params.append(limit)
+        return [row_to_trade(row) for row in self._conn().execute(query, params)]
+
+    # Trades that rank in the top `limit` by volume within their time bucket for any of `windows`, given as
+    # (since_timestamp, bucket_seconds) pairs with bucket-aligned starts, each with its rank per window
+    # (None outside it). One query: the ranking runs over narrow rows and only the winners are read in full.
+    def largest_trades_per_bucket(self, token_address, windows, limit=10):
+        ranks = ', '.join(
+            f"CASE WHEN block_timestamp >= ? THEN ROW_NUMBER() OVER (PARTITION BY block_timestamp / {int(seconds)} "
+            f"ORDER BY volume_usd DESC, block_timestamp DESC, txn_id DESC) END AS rank_{i}"
+            for i, (_, seconds) in enumerate(windows)
+        )
+        ranked = ' OR '.join(f"rank_{i} <= ?" for i in range(len(windows)))
+        params = [since for since, _ in windows]
+        params += [token_address, min(since for since, _ in windows)]
+        params += [limit] * len(windows)
+        rows = self._conn().execute(
+            f"SELECT trades.*, ranked.* FROM (SELECT rowid AS ranked_id, {ranks} FROM trades "
+            f"WHERE token_address = ? AND block_timestamp >= ?) AS ranked "
+            f"JOIN trades ON trades.rowid = ranked.ranked_id WHERE {ranked} ORDER BY trades.block_timestamp",
+            params,
+        )
+        return [
+            (row_to_trade(row), [row[f'rank_{i}'] for i in range(len(windows))])
+            for row in rows
+        ]
+
+    # Add per-wallet deltas to the stored aggregates in one transaction
+    def add_wallet_deltas(self, rows):
+        added = ', '.join(f"{name} = {name} + excluded.{name}" for name in WALLET_COLUMNS[2:10])
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO wallets ({', '.join(WALLET_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in WALLET_COLUMNS)}) "
+                    f"ON CONFLICT (token_address, maker) DO UPDATE SET {added}, "
+                    "first_seen = MIN(first_seen, excluded.first_seen), "
+                    "last_seen = MAX(last_seen, excluded.last_seen)",
+                    rows,
+                )
+
+    # Recompute a token's wallet aggregates from its stored trades (after a backfill, or on first use)
+    def rebuild_wallets(self, token_address):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM wallets WHERE token_address = ?", (token_address,))
+                conn.execute(
+                    f"INSERT INTO wallets ({', '.join(WALLET_COLUMNS)}) "
+                    "SELECT token_address, maker, "
+                    "SUM(CASE WHEN type = 'buy' THEN amount0 ELSE 0 END), "
+                    "SUM(CASE WHEN type = 'buy' THEN 0 ELSE amount0 END), "
+                    "SUM(CASE WHEN type = 'buy' THEN amount0 ELSE -amount0 END), "
+                    "SUM(CASE WHEN type = 'buy' THEN amount1 ELSE 0 END), "
+                    "SUM(CASE WHEN type = 'buy' THEN 0 ELSE amount1 END), "
+                    "SUM(volume_usd), "
+                    "SUM(type = 'buy'), SUM(type != 'buy'), MIN(block_timestamp), MAX(block_timestamp) "
+                    "FROM trades WHERE token_address = ? AND maker != '' GROUP BY maker",
+                    (token_address,),
+                )
+
+    def wallet(self, token_address, maker):
+        row = self._conn().execute(
+            "SELECT * FROM wallets WHERE token_address = ? AND maker = ?", (token_address, maker),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def top_wallets(self, token_address, order='holders', limit=10):
+        rows = self._conn().execute(
+            f"SELECT * FROM wallets WHERE token_address = ? ORDER BY {WALLET_ORDERS[order]} DESC LIMIT ?",
+            (token_address, limit),
+        )
+        return [dict(row) for row in rows]
+
+    def count_wallets(self, token_address):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM wallets WHERE token_address = ?", (token_address,)
+        ).fetchone()[0]
+
+    def count_trades(self, token_address):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM trades WHERE token_address = ?", (token_address,)
+        ).fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_trade_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TradeStore()
+    return _store
@@ -0,0 +1,139 @@
+import codecs
+import json
+import logging
+
+import transport
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# What may follow a complete number or literal; anything else means it continues in the next chunk
+_DELIMITERS = _WHITESPACE + ',:]}'
+
+
+class StreamParseError(ValueError):
+    pass
+
+
+# Incrementally decodes the items of a JSON array (bare, or under an object's "data" key) from text chunks
+class JsonArrayStream:
+    def __init__(self, chunks, array_key='data'):
+        self.chunks = iter(chunks)
+        self.array_key = array_key
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        for chunk in self.chunks:
+            if chunk:
+                # Drop what has already been decoded so the buffer stays about one item long
+                self.buffer = self.buffer[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise StreamParseError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    # Decode one complete value. A number or literal is only complete once a delimiter follows it
+    # ("3" may be the start of "3.5"), so until then, or EOF, read more first.
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                closed = self.buffer[self.pos] in '"[{'
+                if self.eof or (end < len(self.buffer) and (closed or self.buffer[end] in _DELIMITERS)):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise StreamParseError(f"Truncated JSON at offset {self.pos}")
+            self._fill()
+
+    def _enter_array(self):
+        first = self._peek()
+        if first == '[':
+            self.pos += 1
+            return True
+        if first != '{':
+            raise StreamParseError(f"Expected a JSON array or object, got {first!r}")
+        self.pos += 1
+        while self._peek() != '}':
+            key = self._value()
+            self._expect(':')
+            if key == self.array_key and self._peek() == '[':
+                self.pos += 1
+                return True
+            self._value()
+            if self._peek() == ',':
+                self.pos += 1
+        return False
+
+    def __iter__(self):
+        if not self._enter_array():
+            return
+        while True:
+            char = self._peek()
+            if char == ']' or char is None:
+                return
+            if char == ',':
+                self.pos += 1
+                continue
+            yield self._value()
+
+
+# Live /trades response decoded item by item; closing it stops reading the body
+class TradeStream:
+    def __init__(self, url, chunk_size=None):
+        self.url = url
+        self.chunk_size = chunk_size or Config.STREAM_CHUNK_SIZE
+        self.bytes_read = 0
+        self.items = 0
+        self.response = transport.get(url, stream=True)
+        try:
+            self.response.raise_for_status()
+        except Exception:
+            self.response.close()
+            raise
+
+    def _chunks(self):
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+            self.bytes_read += len(chunk)
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+    def __iter__(self):
+        for item in JsonArrayStream(self._chunks()):
+            self.items += 1
+            yield item
+
+    def close(self):
+        # Closing before the body is consumed drops the connection instead of reading the rest of the page;
+        # reconnecting costs less than downloading trades that are already known
+        self.response.close()
+        logger.debug(f"Trade stream for {self.url}: parsed {self.items} items from {self.bytes_read} bytes")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,270 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from config import Config
+from outbox import get_send_queue
+from telemetry import BROADCAST_DELIVERY
+from watch import normalize_chat_id
+
+logger = logging.getLogger(__name__)
+
+SIDES = ('buy', 'sell')
+
+
+# One chat's alert filters; a disabled entry remembers that the chat opted out
+class Subscription:
+    __slots__ = ('chat_id', 'enabled', 'min_usd', 'buys', 'sells', 'tokens')
+
+    def __init__(self, chat_id, enabled=True, min_usd=0.0, buys=True, sells=False, tokens=()):
+        self.chat_id = normalize_chat_id(chat_id)
+        self.enabled = enabled
+        self.min_usd = float(min_usd)
+        self.buys = buys
+        self.sells = sells
+        self.tokens = set(tokens)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['chat'], enabled=data.get('enabled', True), min_usd=data.get('min_usd', 0.0),
+            buys=data.get('buys', True), sells=data.get('sells', False), tokens=data.get('tokens', ()),
+        )
+
+    def as_dict(self):
+        return {
+            'chat': self.chat_id, 'enabled': self.enabled, 'min_usd': self.min_usd,
+            'buys': self.buys, 'sells': self.sells, 'tokens': sorted(self.tokens),
+        }
+
+    def sides(self):
+        return [side for side, wanted in zip(SIDES, (self.buys, self.sells)) if wanted]
+
+    def describe(self):
+        if not self.enabled:
+            return "Notifications are off."
+        sides = ' and '.join(f"{side}s" for side in self.sides()) or 'nothing'
+        minimum = f" of ${self.min_usd:,.0f} or more" if self.min_usd else ""
+        return f"Notifications on for {sides}{minimum} on {len(self.tokens)} token(s)."
+
+
+# Persistent per-chat subscriptions with an index from (token, side) to chats sorted by minimum USD,
+# so matching a trade is a bisect instead of a scan over every chat
+class SubscriptionRegistry:
+    def __init__(self, path=None):
+        self.path = path or Config.SUBSCRIPTIONS_FILE
+        self._subscriptions = {}
+        self._index = {}
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            self._loaded_mtime = os.path.getmtime(self.path)
+            with open(self.path) as f:
+                entries = json.load(f)
+            subscriptions = {}
+            for entry in entries:
+                subscription = Subscription.from_dict(entry)
+                subscriptions[subscription.chat_id] = subscription
+            self._subscriptions = subscriptions
+            self._reindex()
+            logger.info(f"Loaded {len(self._subscriptions)} chat subscriptions")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error loading subscriptions: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [subscription.as_dict() for subscription in self._subscriptions.values()]
+        # Per-process name: split roles save this file from both processes
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    # Pick up subscriptions saved by another process (the command process in a split deployment)
+    def reload(self):
+        if self.path and os.path.exists(self.path) and os.path.getmtime(self.path) != self._loaded_mtime:
+            with self._lock:
+                self._load()
+            return True
+        return False
+
+    # Rebuilt on every change (rare) and swapped in whole, so match() needs no lock
+    def _reindex(self):
+        groups = {}
+        for subscription in self._subscriptions.values():
+            if not subscription.enabled:
+                continue
+            for token in subscription.tokens:
+                for side in subscription.sides():
+                    groups.setdefault((token, side), []).append((subscription.min_usd, subscription.chat_id))
+        index = {}
+        for key, entries in groups.items():
+            entries.sort(key=lambda entry: entry[0])
+            index[key] = ([entry[0] for entry in entries], [entry[1] for entry in entries])
+        self._index = index
+
+    def get(self, chat_id):
+        return self._subscriptions.get(normalize_chat_id(chat_id))
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    # Create or change a chat's subscription; tokens given here are added to the existing set
+    def update(self, chat_id, tokens=(), persist=True, **changes):
+        chat_id = normalize_chat_id(chat_id)
+        with self._lock:
+            subscription = self._subscriptions.get(chat_id)
+            if subscription is None:
+                subscription = self._subscriptions[chat_id] = Subscription(chat_id)
+            for name, value in changes.items():
+                setattr(subscription, name, value)
+            subscription.tokens.update(tokens)
+            self._reindex()
+        if persist:
+            self.save()
+        return subscription
+
+    def remove_token(self, chat_id, token_address, persist=True):
+        with self._lock:
+            subscription = self._subscriptions.get(normalize_chat_id(chat_id))
+            if subscription is None or token_address not in subscription.tokens:
+                return False
+            subscription.tokens.discard(token_address)
+            self._reindex()
+        if persist:
+            self.save()
+        return True
+
+    # Subscribe a chat to a token unless it has a subscription already (including an opted-out one)
+    def ensure(self, chat_id, token_address, persist=True):
+        subscription = self.get(chat_id)
+        if subscription is not None:
+            if not subscription.enabled or token_address in subscription.tokens:
+                return subscription
+        return self.update(chat_id, tokens=[token_address], persist=persist)
+
+    # Carry watchlist chats (including the configured chat) over as subscriptions to their tokens
+    def seed(self, engine):
+        for token in list(engine.tokens.values()):
+            for chat_id in list(token.subscribers):
+                self.ensure(chat_id, token.address, persist=False)
+        self.save()
+
+    def match(self, token_address, trade):
+        entry = self._index.get((token_address, trade.type))
+        if entry is None:
+            return []
+        min_usd, chat_ids = entry
+        return chat_ids[:bisect.bisect_right(min_usd, trade.volume_usd)]
+
+
+# Delivery bookkeeping for one alert sent to many chats
+class Broadcast:
+    def __init__(self, key, chat_ids):
+        self.key = key
+        self.started_at = time.monotonic()
+        self.remaining = len(chat_ids)
+        self.failed = []
+        self.delivery_times = {}
+        self._lock = threading.Lock()
+
+    def callback(self, chat_id):
+        return lambda delivered: self._done(chat_id, delivered)
+
+    def _done(self, chat_id, delivered):
+        elapsed = time.monotonic() - self.started_at
+        with self._lock:
+            if delivered:
+                self.delivery_times[chat_id] = elapsed
+            else:
+                self.failed.append(chat_id)
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if delivered:
+            BROADCAST_DELIVERY.observe(elapsed)
+        if finished:
+            logger.info(f"Broadcast {self.key}: {self.summary()}")
+
+    def report(self):
+        times = sorted(self.delivery_times.values())
+        return {
+            'key': self.key,
+            'delivered': len(times),
+            'failed': len(self.failed),
+            'pending': self.remaining,
+            'p50': times[len(times) // 2] if times else None,
+            'max': times[-1] if times else None,
+            'per_chat': dict(self.delivery_times),
+        }
+
+    def summary(self):
+        report = self.report()
+        if not report['delivered']:
+            return f"0 delivered, {report['failed']} failed"
+        return (
+            f"{report['delivered']} delivered, {report['failed']} failed, "
+            f"p50 {report['p50']:.2f}s, last {report['max']:.2f}s"
+        )
+
+
+# Fans one rendered alert out to many chats through the rate-limited send queue and
+# records when each chat received it
+class Broadcaster:
+    def __init__(self, send_queue=None, history=None):
+        self.send_queue = send_queue or get_send_queue()
+        self.recent = deque(maxlen=history or Config.BROADCAST_HISTORY)
+
+    def _start(self, key, chat_ids):
+        broadcast = Broadcast(key, chat_ids)
+        self.recent.append(broadcast)
+        return broadcast
+
+    def send_buy(self, key, chat_ids, **kwargs):
+        broadcast = self._start(key, chat_ids)
+        for chat_id in chat_ids:
+            self.send_queue.send_buy(chat_id, on_done=broadcast.callback(chat_id), **kwargs)
+        return broadcast
+
+    def send_message(self, key, chat_ids, text, **kwargs):
+        broadcast = self._start(key, chat_ids)
+        for chat_id in chat_ids:
+            self.send_queue.send_message(chat_id, text, on_done=broadcast.callback(chat_id), **kwargs)
+        return broadcast
+
+    def reports(self):
+        return [broadcast.report() for broadcast in list(self.recent)]
+
+
+_registry = None
+_broadcaster = None
+_subscriptions_lock = threading.Lock()
+
+
+def get_subscription_registry():
+    global _registry
+    if _registry is None:
+        with _subscriptions_lock:
+            if _registry is None:
+                _registry = SubscriptionRegistry()
+    return _registry
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        with _subscriptions_lock:
+            if _broadcaster is None:
+                _broadcaster = Broadcaster()
+    return _broadcaster
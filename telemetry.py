@@ -0,0 +1,252 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DELIVERY_BUCKETS = (1.0, 2.0, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+# One named metric family; samples are keyed by the tuple of label values
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    # Read the value at scrape time instead; only for unlabelled gauges
+    def set_function(self, function):
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                return [(self.name, (), (), self._function())]
+            except Exception as e:
+                logger.error(f"Error collecting {self.name}: {e}")
+                return []
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (made cumulative at render), sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def timed(self, function, **labels):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with self.time(**labels):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def samples(self):
+        with self._lock:
+            states = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        samples = []
+        for key, counts, total, count in states:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key, [('le', _format_value(bound))], cumulative))
+            samples.append((f"{self.name}_bucket", key, [('le', '+Inf')], count))
+            samples.append((f"{self.name}_sum", key, (), total))
+            samples.append((f"{self.name}_count", key, (), count))
+        return samples
+
+
+# Process-wide set of metrics rendered in the Prometheus text format
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+UPSTREAM_LATENCY = histogram(
+    'glitchbot_upstream_request_seconds', 'Upstream HTTP request latency per attempt', ['endpoint']
+)
+UPSTREAM_THROTTLED = counter(
+    'glitchbot_upstream_throttled_total', 'Upstream 429 Too Many Requests responses', ['endpoint']
+)
+UPSTREAM_RETRIES = counter('glitchbot_upstream_retries_total', 'Upstream request retries', ['endpoint'])
+ALERT_DELIVERY = histogram(
+    'glitchbot_alert_delivery_seconds', 'Time from trade blockTimestamp to Telegram delivery', ['kind'],
+    buckets=DELIVERY_BUCKETS,
+)
+COMMAND_LATENCY = histogram('glitchbot_command_seconds', 'Chat command handler latency', ['command'])
+CACHE_REQUESTS = counter('glitchbot_cache_requests_total', 'Cache lookups by result', ['cache', 'result'])
+POLLER_LAG = gauge(
+    'glitchbot_poller_lag_seconds', 'How late the last poll of a token started after it was due', ['token']
+)
+SEND_QUEUE_DEPTH = gauge('glitchbot_send_queue_depth', 'Messages waiting in the outbound Telegram queue')
+BROADCAST_DELIVERY = histogram(
+    'glitchbot_broadcast_delivery_seconds', 'Time from the start of a broadcast to delivery in each chat',
+    buckets=DELIVERY_BUCKETS,
+)
+COMMAND_QUEUE_TIME = histogram('glitchbot_command_queue_seconds', 'Time commands wait for a worker', ['command'])
+COMMAND_QUEUE_DEPTH = gauge('glitchbot_command_queue_depth', 'Commands waiting for a worker')
+COMMANDS_SHED = counter('glitchbot_commands_shed_total', 'Commands dropped under load', ['command', 'reason'])
+BACKFILL_TRADES = counter('glitchbot_backfill_trades_total', 'Historical trades written by backfills', ['token'])
+STARTUP_SECONDS = gauge('glitchbot_startup_seconds', 'Time spent starting each component', ['role', 'phase'])
+
+
+# Low-cardinality endpoint label: host plus the first two path segments (e.g. api.moonshot.cc/trades/v1)
+def endpoint_label(url):
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split('/') if segment][:2]
+    return '/'.join([parts.netloc] + segments)
+
+
+def cache_result(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def create_app(registry=None):
+    from flask import Flask, Response
+
+    registry = registry or REGISTRY
+    app = Flask(__name__)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return app
+
+
+# Serve a Flask app from a daemon thread next to the bot
+def start_http_server(app, host, port, name):
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    logger.info(f"Serving {name} on http://{host}:{server.server_port}")
+    return server
+
+
+def start_metrics_server(host=None, port=None):
+    host = host or Config.METRICS_HOST
+    port = Config.METRICS_PORT if port is None else port
+    return start_http_server(create_app(), host, port, 'metrics-http')
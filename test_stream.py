@@ -0,0 +1,45 @@
+import json
+import random
+
+import pytest
+
+from stream import JsonArrayStream, StreamParseError
+
+DOCUMENTS = [
+    [3.5, -12, 1e-3, 2.5E+10, 0, True, False, None, "a,b]", {"x": [1.25, "}"]}, [], {}],
+    {"data": [{"txnId": "abc", "amount0": "12.5", "blockNumber": 123456789, "price": 0.000012}], "next": 7},
+    {"meta": {"n": 10.75, "flags": [True, None]}, "data": [1234567.125, "ü\\\"x", -0.5]},
+]
+
+
+def chunked(text, sizes):
+    position = 0
+    while position < len(text):
+        size = next(sizes)
+        yield text[position:position + size]
+        position += size
+
+
+def items(document):
+    return document['data'] if isinstance(document, dict) else document
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64])
+def test_fixed_chunk_sizes(document, size):
+    text = json.dumps(document)
+    assert list(JsonArrayStream(chunked(text, iter(lambda: size, None)))) == items(document)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_random_chunk_sizes(seed):
+    rng = random.Random(seed)
+    document = DOCUMENTS[seed % len(DOCUMENTS)]
+    text = json.dumps(document, indent=rng.choice([None, 1]))
+    sizes = iter(lambda: rng.randint(1, 6), None)
+    assert list(JsonArrayStream(chunked(text, sizes))) == items(document)
+
+
+def test_truncated_number_at_eof_is_an_error():
+    with pytest.raises(StreamParseError):
+        list(JsonArrayStream(['[3.', '']))
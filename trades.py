@@ -0,0 +1,164 @@
+import logging
+import sys
+import threading
+from array import array
+
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BUY = 1
+SELL = -1
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else ''
+
+
+# One trade, parsed once at ingest into typed fields; repeated ids are interned
+class Trade:
+    __slots__ = (
+        'txn_id', 'dex_id', 'pair_id', 'asset0_id', 'asset1_id', 'block_number', 'block_timestamp',
+        'maker', 'type', 'amount0', 'amount1', 'price_native', 'price_usd', 'volume_usd',
+        'progress', 'curve_position',
+    )
+
+    def __init__(self, txn_id, block_number, block_timestamp, type, maker='', dex_id='', pair_id='',
+                 asset0_id='', asset1_id='', amount0=0.0, amount1=0.0, price_native=0.0, price_usd=0.0,
+                 volume_usd=0.0, progress=0.0, curve_position=0):
+        self.txn_id = txn_id
+        self.block_number = block_number
+        self.block_timestamp = block_timestamp
+        self.type = type
+        self.maker = maker
+        self.dex_id = dex_id
+        self.pair_id = pair_id
+        self.asset0_id = asset0_id
+        self.asset1_id = asset1_id
+        self.amount0 = amount0
+        self.amount1 = amount1
+        self.price_native = price_native
+        self.price_usd = price_usd
+        self.volume_usd = volume_usd
+        self.progress = progress
+        self.curve_position = curve_position
+
+    @classmethod
+    def from_json(cls, data):
+        metadata = data.get('metadata') or {}
+        try:
+            curve_position = int(metadata.get('curvePosition') or 0)
+        except (TypeError, ValueError):
+            curve_position = 0
+        return cls(
+            txn_id=data.get('txnId', ''),
+            block_number=int(data.get('blockNumber') or 0),
+            block_timestamp=int(data.get('blockTimestamp') or 0),
+            type=_intern(data.get('type')),
+            maker=_intern(data.get('maker')),
+            dex_id=_intern(data.get('dexId')),
+            pair_id=_intern(data.get('pairId')),
+            asset0_id=_intern(data.get('asset0Id')),
+            asset1_id=_intern(data.get('asset1Id')),
+            amount0=_to_float(data.get('amount0')),
+            amount1=_to_float(data.get('amount1')),
+            price_native=_to_float(data.get('priceNative')),
+            price_usd=_to_float(data.get('priceUsd')),
+            volume_usd=_to_float(data.get('volumeUsd')),
+            progress=_to_float(metadata.get('progress')),
+            curve_position=curve_position,
+        )
+
+    @property
+    def is_buy(self):
+        return self.type == 'buy'
+
+    @property
+    def position(self):
+        return (self.block_number, self.block_timestamp)
+
+    def __repr__(self):
+        return f"Trade({self.type} {self.volume_usd:.2f} USD by {self.maker} in {self.txn_id})"
+
+
+# Columnar ring buffer of trades backed by typed arrays. Columns grow with the trades (amortized
+# doubling) up to capacity and only then wrap, so a quiet token costs a few bytes, not a full ring.
+class TradeBuffer:
+    COLUMNS = {
+        'block_number': 'q', 'block_timestamp': 'q', 'side': 'b', 'amount0': 'd', 'amount1': 'd',
+        'price_native': 'd', 'price_usd': 'd', 'volume_usd': 'd', 'progress': 'd',
+    }
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or Config.TRADE_BUFFER_SIZE
+        self.head = 0
+        self.size = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        for name, typecode in self.COLUMNS.items():
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return self.size
+
+    def append(self, trade):
+        row = (
+            trade.block_number, trade.block_timestamp, BUY if trade.type == 'buy' else SELL, trade.amount0,
+            trade.amount1, trade.price_native, trade.price_usd, trade.volume_usd, trade.progress,
+        )
+        with self._lock:
+            if self.size < self.capacity:
+                for name, value in zip(self.COLUMNS, row):
+                    getattr(self, name).append(value)
+                self.size += 1
+                self.head = self.size % self.capacity
+                return
+            i = self.head
+            for name, value in zip(self.COLUMNS, row):
+                getattr(self, name)[i] = value
+            self.head = (i + 1) % self.capacity
+
+    def extend(self, trades):
+        for trade in trades:
+            self.append(trade)
+
+    def clear(self):
+        with self._lock:
+            self.head = 0
+            self.size = 0
+            self._reset()
+
+    # NumPy copy of a column in insertion order (oldest first). Copied under the lock, because a
+    # growing array cannot be resized while a view of it is alive.
+    def column(self, name):
+        with self._lock:
+            values = getattr(self, name)
+            column = np.frombuffer(values, dtype=values.typecode)
+            if self.size < self.capacity:
+                return column.copy()
+            return np.concatenate((column[self.head:], column[:self.head]))
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+# Process-wide buffer per token
+def get_trade_buffer(token_address):
+    buffer = _buffers.get(token_address)
+    if buffer is None:
+        with _buffers_lock:
+            buffer = _buffers.get(token_address)
+            if buffer is None:
+                buffer = _buffers[token_address] = TradeBuffer()
+    return buffer
@@ -0,0 +1,234 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from telemetry import UPSTREAM_LATENCY, UPSTREAM_RETRIES, UPSTREAM_THROTTLED, endpoint_label
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    pass
+
+
+# Per-host latency and error counters
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.last_error = None
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'rejected': self.rejected,
+            'latency_avg': self.latency_total / self.requests if self.requests else 0.0,
+            'latency_max': self.latency_max,
+            'last_error': self.last_error,
+        }
+
+
+# Opens after N consecutive failures, then lets one trial request through after the cooldown
+class CircuitBreaker:
+    def __init__(self, host, threshold, cooldown):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit for {self.host} closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    # Frees the half-open trial slot when a request ends without a success or failure being recorded
+    def release(self):
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold and (self.opened_at is None or self.state == 'half-open'):
+                self.opened_at = time.monotonic()
+                logger.warning(f"Circuit for {self.host} opened after {self.failures} consecutive failures")
+
+
+# Shared HTTP transport: one keep-alive session per host, timeouts, retries and circuit breaking
+class HttpTransport:
+    def __init__(self, timeout=None, max_retries=None, backoff_base=None, backoff_max=None, pool_size=None):
+        self.timeout = timeout or (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+        self.max_retries = Config.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or Config.HTTP_BACKOFF_BASE
+        self.backoff_max = backoff_max or Config.HTTP_BACKOFF_MAX
+        self.pool_size = pool_size or Config.HTTP_POOL_SIZE
+        self._sessions = {}
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, host):
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._breakers[host] = CircuitBreaker(
+                        host, Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_RESET_TIMEOUT
+                    )
+                    self._stats[host] = HostStats()
+                    self._sessions[host] = session
+        return session, self._breakers[host], self._stats[host]
+
+    def _backoff(self, attempt):
+        # Full jitter: sleep somewhere in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                # Malformed header: fall back to computed backoff
+                return None
+        return max(0.0, min(delay, Config.HTTP_RETRY_AFTER_MAX))
+
+    def request(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        session, breaker, stats = self._host_state(host)
+        endpoint = endpoint_label(url)
+        kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                stats.rejected += 1
+                raise CircuitOpenError(f"Circuit open for {host}")
+
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(stats, endpoint, started, error=e)
+                breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            except Exception:
+                # Not a verdict on the host (e.g. an invalid URL); don't leave a half-open trial hanging
+                breaker.release()
+                raise
+            else:
+                self._record(stats, endpoint, started, error=None if response.status_code < 500 else response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                if response.status_code == 429:
+                    stats.throttled += 1
+                    UPSTREAM_THROTTLED.inc(endpoint=endpoint)
+                    # Throttling means the host is up, so it does not count against the breaker
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+                if attempt >= self.max_retries:
+                    return response
+                delay = self._retry_after(response) if response.status_code in (429, 503) else None
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+
+            attempt += 1
+            stats.retries += 1
+            UPSTREAM_RETRIES.inc(endpoint=endpoint)
+            logger.debug(f"Retrying {method} {host} in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def _record(self, stats, endpoint, started, error=None):
+        elapsed = time.monotonic() - started
+        UPSTREAM_LATENCY.observe(elapsed, endpoint=endpoint)
+        stats.requests += 1
+        stats.latency_total += elapsed
+        stats.latency_max = max(stats.latency_max, elapsed)
+        if error is not None:
+            stats.errors += 1
+            stats.last_error = str(error)
+
+    def host_stats(self):
+        return {
+            host: dict(stats.as_dict(), circuit=self._breakers[host].state)
+            for host, stats in list(self._stats.items())
+        }
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HttpTransport()
+    return _transport
+
+
+def get(url, **kwargs):
+    return get_transport().get(url, **kwargs)
+
+
+def host_stats():
+    return get_transport().host_stats()
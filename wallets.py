@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+from store import WALLET_ORDERS, get_trade_store
+
+logger = logging.getLogger(__name__)
+
+ORDERS = tuple(WALLET_ORDERS)
+
+
+# Changes to one wallet's aggregates that are not in the store yet
+class WalletDelta:
+    __slots__ = ('bought', 'sold', 'sol_spent', 'sol_received', 'volume_usd', 'buys', 'sells',
+                 'first_seen', 'last_seen')
+
+    def __init__(self):
+        self.bought = self.sold = self.sol_spent = self.sol_received = self.volume_usd = 0.0
+        self.buys = self.sells = 0
+        self.first_seen = self.last_seen = None
+
+    def add(self, trade):
+        if trade.is_buy:
+            self.bought += trade.amount0
+            self.sol_spent += trade.amount1
+            self.buys += 1
+        else:
+            self.sold += trade.amount0
+            self.sol_received += trade.amount1
+            self.sells += 1
+        self.volume_usd += trade.volume_usd
+        timestamp = trade.block_timestamp
+        if self.first_seen is None or timestamp < self.first_seen:
+            self.first_seen = timestamp
+        if self.last_seen is None or timestamp > self.last_seen:
+            self.last_seen = timestamp
+
+    # Row in store.WALLET_COLUMNS order
+    def row(self, token_address, maker):
+        return (
+            token_address, maker, self.bought, self.sold, self.bought - self.sold, self.sol_spent,
+            self.sol_received, self.volume_usd, self.buys, self.sells, self.first_seen, self.last_seen,
+        )
+
+
+# Per-wallet aggregates (bought/sold amount0, SOL spent/received, USD volume, trade counts, first/last seen).
+# Ingest only touches in-memory deltas; once WALLET_MEMORY_BUDGET wallets are held, the least recently
+# active ones (of any token) are spilled onto the stored aggregates. Queries flush first and read indexed
+# store rows, so leaderboards never rescan trades and memory stays bounded however many makers there are.
+class WalletIndex:
+    def __init__(self, store=None, budget=None, flush_interval=None):
+        self.store = store or get_trade_store()
+        self.budget = budget or Config.WALLET_MEMORY_BUDGET
+        self.flush_interval = flush_interval or Config.WALLET_FLUSH_INTERVAL
+        # token -> {maker -> WalletDelta}
+        self._pending = {}
+        # (token, maker) of every pending delta, least recently active first
+        self._recency = OrderedDict()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._recency)
+
+    def _write(self, token_address, items):
+        if items:
+            self.store.add_wallet_deltas([delta.row(token_address, maker) for maker, delta in items])
+
+    def _spill(self, count):
+        spilled = {}
+        for _ in range(min(count, len(self._recency))):
+            token_address, maker = self._recency.popitem(last=False)[0]
+            spilled.setdefault(token_address, []).append((maker, self._pending[token_address].pop(maker)))
+        for token_address, items in spilled.items():
+            self._write(token_address, items)
+        logger.debug(f"Spilled {sum(map(len, spilled.values()))} cold wallets of {len(spilled)} tokens to the store")
+
+    def _flush_locked(self, token_address=None):
+        tokens = [token_address] if token_address else list(self._pending)
+        for token in tokens:
+            pending = self._pending.pop(token, None)
+            if pending:
+                for maker in pending:
+                    del self._recency[(token, maker)]
+                self._write(token, list(pending.items()))
+        if token_address is None:
+            self._flushed_at = time.monotonic()
+
+    def add_trades(self, token_address, trades):
+        with self._lock:
+            pending = self._pending.setdefault(token_address, {})
+            for trade in trades:
+                if not trade.maker:
+                    continue
+                key = (token_address, trade.maker)
+                delta = pending.get(trade.maker)
+                if delta is None:
+                    delta = pending[trade.maker] = WalletDelta()
+                    self._recency[key] = None
+                else:
+                    self._recency.move_to_end(key)
+                delta.add(trade)
+            if len(self._recency) > self.budget:
+                # Spill a quarter of the budget at once so spills stay rare
+                self._spill(len(self._recency) - self.budget + self.budget // 4)
+            # Bounds what a crash can lose to one flush interval of deltas
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self, token_address=None):
+        with self._lock:
+            self._flush_locked(token_address)
+
+    def wallet(self, token_address, maker):
+        with self._lock:
+            pending = self._pending.get(token_address)
+            delta = pending.pop(maker, None) if pending else None
+            if delta is not None:
+                del self._recency[(token_address, maker)]
+                self._write(token_address, [(maker, delta)])
+        return self.store.wallet(token_address, maker)
+
+    def top(self, token_address, order='holders', limit=None):
+        self.flush(token_address)
+        return self.store.top_wallets(token_address, order, limit or Config.WALLET_LEADERBOARD_SIZE)
+
+    # Recompute from the stored trades, dropping deltas those trades already include
+    def rebuild(self, token_address):
+        with self._lock:
+            for maker in self._pending.pop(token_address, ()):
+                del self._recency[(token_address, maker)]
+            self.store.rebuild_wallets(token_address)
+        logger.info(f"Rebuilt {self.store.count_wallets(token_address)} wallet aggregates for {token_address}")
+
+    # Build the aggregates from history the first time a token with stored trades is seen
+    def ensure(self, token_address):
+        if not self.store.count_wallets(token_address) and self.store.count_trades(token_address):
+            self.rebuild(token_address)
+
+
+_wallet_index = None
+_wallet_index_lock = threading.Lock()
+
+
+def get_wallet_index():
+    global _wallet_index
+    if _wallet_index is None:
+        with _wallet_index_lock:
+            if _wallet_index is None:
+                _wallet_index = WalletIndex()
+    return _wallet_index
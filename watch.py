@@ -0,0 +1,260 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from fetchers import stream_latest_trades
+from prices import value_trades
+from ingest import TradeIngestor
+from scheduler import AdaptivePoller, get_request_budget
+from snapshot import get_token_cache
+from store import get_trade_store
+from telemetry import POLLER_LAG
+
+logger = logging.getLogger(__name__)
+
+SOLANA_ADDRESS = re.compile(r'[1-9A-HJ-NP-Za-km-z]{32,44}')
+EVM_ADDRESS = re.compile(r'0x[0-9a-fA-F]{40}')
+
+
+# Token addresses as the chain writes them: base58 mints on Solana, 0x-prefixed hex elsewhere
+def is_token_address(address, chain_id=None):
+    pattern = SOLANA_ADDRESS if (chain_id or Config.CHAIN_ID) == 'solana' else EVM_ADDRESS
+    return bool(pattern.fullmatch(address or ''))
+
+
+# Chat ids arrive as ints from Telegram and as strings from the environment
+def normalize_chat_id(chat_id):
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return chat_id
+
+
+# Per-token state: snapshot cache, trade cursor, poller and the chats that want its alerts
+class WatchedToken:
+    def __init__(self, chain_id, address, subscribers=(), on_trades=None):
+        self.chain_id = chain_id
+        self.address = address
+        self.subscribers = {normalize_chat_id(chat_id) for chat_id in subscribers}
+        self.cache = get_token_cache(chain_id, address)
+        store = get_trade_store()
+        self.ingestor = TradeIngestor(
+            cursor=store.load_cursor(chain_id, address),
+            seen_txn_ids=store.recent_txn_ids(address, Config.INGEST_SEEN_SIZE),
+            sink=lambda trades, cursor: store.record(chain_id, address, value_trades(trades), cursor),
+        )
+        self.poller = AdaptivePoller(
+            token_cache=self.cache,
+            fetch_trades=lambda: stream_latest_trades(chain_id, address),
+            ingestor=self.ingestor,
+            on_trades=lambda trades: on_trades(self, trades) if on_trades else None,
+        )
+        self.next_due = 0.0
+
+    @property
+    def key(self):
+        return (self.chain_id, self.address)
+
+    def snapshot(self):
+        return self.cache.peek()
+
+    def as_dict(self):
+        return {'chain': self.chain_id, 'address': self.address, 'chats': sorted(self.subscribers, key=str)}
+
+
+# Tracks N tokens in one process, sharing the connection pool and request budget between them
+class WatchEngine:
+    def __init__(self, watchlist_file=None, budget=None):
+        self.watchlist_file = watchlist_file or Config.WATCHLIST_FILE
+        self.budget = budget or get_request_budget()
+        self.tokens = {}
+        self.listeners = []
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        self._workers = ThreadPoolExecutor(max_workers=Config.WATCH_WORKERS, thread_name_prefix='watch')
+        self._stop = threading.Event()
+        # Running average of upstream requests per poll, used to size the fair-share interval
+        self._cost_per_poll = 1.5
+        self._loaded_mtime = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _dispatch_trades(self, token, trades):
+        for listener in self.listeners:
+            try:
+                listener(token, trades)
+            except Exception as e:
+                logger.error(f"Error in trade listener for {token.address}: {e}")
+
+    def watch(self, address, chain_id=None, chat_id=None, persist=True):
+        chain_id = chain_id or Config.CHAIN_ID
+        with self._lock:
+            token = self.tokens.get((chain_id, address))
+            if token is None:
+                token = WatchedToken(chain_id, address, on_trades=self._dispatch_trades)
+                self.tokens[token.key] = token
+                self._schedule(token, time.monotonic())
+                logger.info(f"Watching {chain_id}/{address} ({len(self.tokens)} tokens)")
+            if chat_id is not None:
+                token.subscribers.add(normalize_chat_id(chat_id))
+        if persist:
+            self.save()
+        return token
+
+    def unwatch(self, address, chain_id=None, chat_id=None, persist=True):
+        chain_id = chain_id or Config.CHAIN_ID
+        with self._lock:
+            token = self.tokens.get((chain_id, address))
+            if token is None:
+                return False
+            if chat_id is not None:
+                token.subscribers.discard(normalize_chat_id(chat_id))
+            if chat_id is None or not token.subscribers:
+                del self.tokens[token.key]
+                POLLER_LAG.remove(token=address)
+                logger.info(f"Stopped watching {chain_id}/{address}")
+        if persist:
+            self.save()
+        return True
+
+    def get(self, address, chain_id=None):
+        return self.tokens.get((chain_id or Config.CHAIN_ID, address))
+
+    def watched_by(self, chat_id):
+        chat_id = normalize_chat_id(chat_id)
+        return [token for token in list(self.tokens.values()) if chat_id in token.subscribers]
+
+    # (chain, address) -> chats from the watchlist file, plus the configured token for the configured chat
+    def _read_watchlist(self):
+        wanted = {}
+        if self.watchlist_file and os.path.exists(self.watchlist_file):
+            with open(self.watchlist_file) as f:
+                entries = json.load(f)
+            for entry in entries:
+                if isinstance(entry, str):
+                    entry = {'address': entry}
+                key = (entry.get('chain') or Config.CHAIN_ID, entry['address'])
+                chats = wanted.setdefault(key, set())
+                chats.update(normalize_chat_id(chat_id) for chat_id in entry.get('chats', []))
+        if Config.TOKEN_ADDRESS:
+            chats = wanted.setdefault((Config.CHAIN_ID, Config.TOKEN_ADDRESS), set())
+            if Config.TELEGRAM_CHAT_ID is not None:
+                chats.add(normalize_chat_id(Config.TELEGRAM_CHAT_ID))
+        return wanted
+
+    def load(self):
+        for (chain_id, address), chats in self._read_watchlist().items():
+            self.watch(address, chain_id, persist=False).subscribers.update(chats)
+        if self.watchlist_file and os.path.exists(self.watchlist_file):
+            self._loaded_mtime = os.path.getmtime(self.watchlist_file)
+        logger.info(f"Loaded watchlist with {len(self.tokens)} tokens")
+
+    # Apply watchlist changes saved by another process (the command process in a split deployment);
+    # returns the tokens that were added
+    def sync(self):
+        if not self.watchlist_file or not os.path.exists(self.watchlist_file):
+            return []
+        mtime = os.path.getmtime(self.watchlist_file)
+        if mtime == self._loaded_mtime:
+            return []
+        self._loaded_mtime = mtime
+        wanted = self._read_watchlist()
+        added = [key for key in wanted if key not in self.tokens]
+        for (chain_id, address), chats in wanted.items():
+            self.watch(address, chain_id, persist=False).subscribers = chats
+        for chain_id, address in [key for key in self.tokens if key not in wanted]:
+            self.unwatch(address, chain_id, persist=False)
+        logger.info(f"Synced watchlist: {len(self.tokens)} tokens, {len(added)} new")
+        return [self.tokens[key] for key in added]
+
+    def save(self):
+        if not self.watchlist_file:
+            return
+        with self._lock:
+            entries = [token.as_dict() for token in self.tokens.values()]
+        # Per-process name: split roles save this file from both processes
+        tmp_path = f"{self.watchlist_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.watchlist_file)
+        self._loaded_mtime = os.path.getmtime(self.watchlist_file)
+
+    def _schedule(self, token, due):
+        token.next_due = due
+        heapq.heappush(self._queue, (due, next(self._sequence), token.key))
+        self._lock.notify()
+
+    # Shortest interval every token can get while the whole watchlist stays inside the budget
+    def fair_interval(self):
+        return len(self.tokens) * self._cost_per_poll * 60.0 / self.budget.per_minute
+
+    def _next_due_token(self):
+        with self._lock:
+            while not self._stop.is_set():
+                if not self._queue:
+                    self._lock.wait(1.0)
+                    continue
+                due, _, key = self._queue[0]
+                token = self.tokens.get(key)
+                if token is None or token.next_due != due:
+                    # Unwatched or rescheduled since this entry was queued
+                    heapq.heappop(self._queue)
+                    continue
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._lock.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+                return token
+        return None
+
+    def _poll(self, token, cost):
+        try:
+            token.poller.poll_once(acquire=False)
+        except Exception as e:
+            logger.error(f"Error polling {token.address}: {e}")
+            token.poller.interval = min(token.poller.max_interval, token.poller.interval * Config.POLL_BACKOFF_FACTOR)
+        finally:
+            self._cost_per_poll = 0.95 * self._cost_per_poll + 0.05 * cost
+            interval = max(token.poller.interval, self.fair_interval())
+            with self._lock:
+                if token.key in self.tokens:
+                    self._schedule(token, time.monotonic() + interval)
+
+    # Earliest-due-first dispatch; waiting on the shared budget here keeps the order fair
+    def run(self):
+        while not self._stop.is_set():
+            token = self._next_due_token()
+            if token is None:
+                break
+            cost = token.poller.requests_needed()
+            self.budget.acquire(cost)
+            POLLER_LAG.set(time.monotonic() - token.next_due, token=token.address)
+            self._workers.submit(self._poll, token, cost)
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._lock.notify_all()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_watch_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = WatchEngine()
+    return _engine
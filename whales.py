@@ -0,0 +1,150 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {
+    '1h': 3600,
+    '24h': 86400,
+    '7d': 7 * 86400,
+}
+
+# Each window is split into this many time buckets, each holding its own top-K heap
+BUCKETS_PER_WINDOW = 24
+
+
+# Top-K trades by volumeUsd over a rolling window, kept as a deque of per-bucket bounded heaps
+class RollingTopK:
+    def __init__(self, window_seconds, k, buckets=BUCKETS_PER_WINDOW):
+        self.window = window_seconds
+        self.k = k
+        self.bucket_seconds = max(1, window_seconds // buckets)
+        # (bucket_start, min-heap of (volume_usd, block_timestamp, txn_id, trade))
+        self._buckets = deque()
+        self._version = 0
+        self._cached = None
+
+    def add(self, trade, volume_usd, timestamp):
+        bucket_start = timestamp - timestamp % self.bucket_seconds
+        bucket = None
+        if self._buckets and self._buckets[-1][0] == bucket_start:
+            bucket = self._buckets[-1][1]
+        elif not self._buckets or self._buckets[-1][0] < bucket_start:
+            bucket = []
+            self._buckets.append((bucket_start, bucket))
+        else:
+            # Late trade for an older bucket (backfill); find it or insert in order
+            for start, heap in self._buckets:
+                if start == bucket_start:
+                    bucket = heap
+                    break
+            if bucket is None:
+                if bucket_start + self.bucket_seconds <= time.time() - self.window:
+                    return
+                bucket = []
+                self._buckets.append((bucket_start, bucket))
+                self._buckets = deque(sorted(self._buckets, key=lambda item: item[0]))
+
+        entry = (volume_usd, timestamp, trade.txn_id, trade)
+        if len(bucket) < self.k:
+            heapq.heappush(bucket, entry)
+        elif entry[:3] > bucket[0][:3]:
+            heapq.heapreplace(bucket, entry)
+        else:
+            return
+        self._version += 1
+
+    def evict(self, now=None):
+        cutoff = (now or time.time()) - self.window
+        evicted = False
+        while self._buckets and self._buckets[0][0] + self.bucket_seconds <= cutoff:
+            self._buckets.popleft()
+            evicted = True
+        if evicted:
+            self._version += 1
+
+    # Merges at most BUCKETS_PER_WINDOW * k entries, independent of how many trades were seen. Only the
+    # oldest bucket can straddle the cutoff, so its expired entries are dropped before ranking and the
+    # ranking of the other buckets is cached until they change.
+    def top(self, now=None):
+        now = now or time.time()
+        self.evict(now)
+        if not self._buckets:
+            return []
+        cutoff = now - self.window
+        if self._cached is not None and self._cached[0] == self._version:
+            ranked = self._cached[1]
+        else:
+            entries = (entry for _, heap in itertools.islice(self._buckets, 1, None) for entry in heap)
+            ranked = heapq.nlargest(self.k, entries, key=lambda entry: entry[:3])
+            self._cached = (self._version, ranked)
+        oldest = [entry for entry in self._buckets[0][1] if entry[1] >= cutoff]
+        ranked = heapq.nlargest(self.k, itertools.chain(ranked, oldest), key=lambda entry: entry[:3])
+        return [entry[3] for entry in ranked]
+
+
+# Per-token rolling whale leaderboards for every window
+class WhaleIndex:
+    def __init__(self, k=None):
+        self.k = k or Config.WHALE_TOP_K
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def _windows(self, token_address):
+        windows = self._tokens.get(token_address)
+        if windows is None:
+            windows = self._tokens[token_address] = {
+                name: RollingTopK(seconds, self.k) for name, seconds in WINDOWS.items()
+            }
+        return windows
+
+    def add_trades(self, token_address, trades, windows=None):
+        with self._lock:
+            token_windows = self._windows(token_address)
+            indexes = [token_windows[name] for name in windows] if windows else list(token_windows.values())
+            for trade in trades:
+                for index in indexes:
+                    index.add(trade, trade.volume_usd, trade.block_timestamp)
+
+    def top(self, token_address, window='24h', min_usd=0.0, limit=None):
+        with self._lock:
+            index = self._windows(token_address)[window]
+            trades = index.top()
+        trades = [trade for trade in trades if trade.volume_usd >= min_usd]
+        return trades[:limit] if limit else trades
+
+
+_whale_index = None
+_whale_index_lock = threading.Lock()
+
+
+def get_whale_index():
+    global _whale_index
+    if _whale_index is None:
+        with _whale_index_lock:
+            if _whale_index is None:
+                _whale_index = WhaleIndex()
+    return _whale_index
+
+
+# Seed a token's index from the local trade store so /whales is warm after a restart: one query ranks
+# the trades within every window's buckets, keeping the exact top-K per bucket so later evictions promote
+# the right trades
+def warm_whale_index(store, token_address, now=None):
+    now = int(now or time.time())
+    index = get_whale_index()
+    windows = []
+    for seconds in WINDOWS.values():
+        bucket_seconds = max(1, seconds // BUCKETS_PER_WINDOW)
+        start = now - seconds
+        windows.append((start - start % bucket_seconds, bucket_seconds))
+    rows = store.largest_trades_per_bucket(token_address, windows, limit=index.k)
+    for position, name in enumerate(WINDOWS):
+        trades = [trade for trade, ranks in rows if ranks[position] is not None and ranks[position] <= index.k]
+        index.add_trades(token_address, trades, windows=[name])